@@ -0,0 +1,31 @@
+import os
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from .database import SQLALCHEMY_DATABASE_URL, set_sqlite_pragmas
+
+# Same DB as the sync app, through the aiosqlite driver unless TRACKER_ASYNC_DATABASE_URL says otherwise
+ASYNC_SQLALCHEMY_DATABASE_URL = os.environ.get(
+    'TRACKER_ASYNC_DATABASE_URL',
+    SQLALCHEMY_DATABASE_URL.replace('sqlite://', 'sqlite+aiosqlite://', 1),
+)
+
+# Connections are kept open between requests, WAL allows many readers alongside the one writer
+POOL_SIZE = 20
+MAX_OVERFLOW = 30
+POOL_TIMEOUT = 30
+
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
+    connect_args={"check_same_thread":False},
+)
+if async_engine.dialect.name == "sqlite":
+    event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+
+AsyncSessionLocal = sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
@@ -0,0 +1,247 @@
+#*********************************************************************************#
+# Async variant of the API in main.py, served through the aiosqlite engine        #
+# Run it with: uvicorn applicant.async_main:app                                   #
+#*********************************************************************************#
+from typing import List, Optional
+from fastapi import FastAPI, Depends, HTTPException, Query, status
+from sqlalchemy import delete as sql_delete, select, update as sql_update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from . import schemas, models, migrations, queries, batch, cache, review, search, summary, instrumentation
+from .database import engine
+from .async_database import AsyncSessionLocal, async_engine
+
+app = FastAPI()
+
+# Create the tables if they don't exist and bring older DBs up to date
+migrations.upgrade(engine)
+
+# TRACKER_METRICS=1 times SQL statements and requests, served on GET /metrics
+if instrumentation.METRICS_ENABLED:
+    instrumentation.instrument_app(app, async_engine.sync_engine)
+
+@app.on_event("shutdown")
+async def dispose_engine():
+    await async_engine.dispose()
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Lazy loads cannot run under asyncio, so every query that is serialized with its relationship loads it up front
+def applicant_with_task():
+    return select(models.Applicant).options(selectinload(models.Applicant.task))
+
+def assignment_with_person():
+    return select(models.AdditionalInfo).options(selectinload(models.AdditionalInfo.person))
+
+# Create an applicant
+@app.post('/applicant', response_model=schemas.ShowApplicant ,status_code=status.HTTP_201_CREATED, tags=['applicants'])
+async def create(request: schemas.Applicant, db: AsyncSession = Depends(get_db)):
+    if await db.get(models.Applicant, request.netid):
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=f"Applicant with netid "+request.netid+" already exists")
+    if not await db.get(models.AdditionalInfo, request.task_id):
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=f"Task ID " + str(request.task_id) + " does not exist")
+    db.add(models.Applicant(**request.dict()))
+    await db.commit()
+    cache.applicant_cache.invalidate(request.netid)
+    return (await db.execute(applicant_with_task().where(models.Applicant.netid == request.netid))).scalar_one()
+
+# Create many applicants at once, validated with set-based queries and inserted in one transaction
+@app.post('/applicants:batch', response_model=schemas.BatchResult, status_code=status.HTTP_201_CREATED, tags=['applicants'])
+async def create_batch(request: schemas.ApplicantBatch, db: AsyncSession = Depends(get_db)):
+    result = await db.run_sync(batch.create_applicants, request)
+    cache.applicant_cache.invalidate(*[item.netid for item in request.items])
+    if request.atomic and result.failed:
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=result.dict())
+    return result
+
+# Update many applicants at once, each item like a PATCH body with the netid it changes
+@app.patch('/applicants:batch', response_model=schemas.BatchResult, tags=['applicants'])
+async def update_batch(request: schemas.ApplicantBatchUpdate, db: AsyncSession = Depends(get_db)):
+    result = await db.run_sync(batch.update_applicants, request)
+    cache.applicant_cache.invalidate(*[item.netid for item in request.items])
+    if request.atomic and result.failed:
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=result.dict())
+    return result
+
+# Delete many applicants at once
+@app.post('/applicants:delete', response_model=schemas.BatchResult, tags=['applicants'])
+async def delete_batch(request: schemas.ApplicantBatchDelete, db: AsyncSession = Depends(get_db)):
+    result = await db.run_sync(batch.delete_applicants, request)
+    cache.applicant_cache.invalidate(*request.netids)
+    if request.atomic and result.failed:
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=result.dict())
+    return result
+
+# Delete an applicant by their netid
+@app.delete('/applicant/{netid}',tags=['applicants'])
+async def delete(netid: str, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(sql_delete(models.Applicant).where(models.Applicant.netid == netid))
+    if result.rowcount == 0:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Applicant with netid '{netid}' not found")
+    await db.commit()
+    cache.applicant_cache.invalidate(netid)
+    return 'deleted'
+
+# Update an applicant by their netid
+@app.put('/applicant/{netid}', status_code=status.HTTP_202_ACCEPTED, tags=['applicants'])
+async def update(netid: str, request: schemas.Applicant, db: AsyncSession = Depends(get_db)):
+    if not await db.get(models.Applicant, netid):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Applicant with netid '{netid}' does not exist")
+    if not await db.get(models.AdditionalInfo, request.task_id):
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=f"Task ID " + str(request.task_id) + " does not exist")
+    if await db.get(models.Applicant, request.netid):
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=f"Applicant with netid "+request.netid+" already exists")
+    await db.execute(sql_update(models.Applicant).where(models.Applicant.netid == netid).values(**request.dict(), version=models.Applicant.version + 1))
+    await db.commit()
+    cache.applicant_cache.invalidate(netid, request.netid)
+    return 'updated'
+
+# Update only the fields sent, 409 if the applicant changed since `version` was read
+@app.patch('/applicant/{netid}', response_model=schemas.ApplicantVersion, tags=['applicants'])
+async def patch(netid: str, request: schemas.ApplicantPatch, db: AsyncSession = Depends(get_db)):
+    try:
+        result = await db.run_sync(review.patch_applicant, netid, request)
+    except review.NotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Applicant with netid '{netid}' does not exist")
+    except review.UnknownTask as e:
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=str(e))
+    except review.VersionConflict as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail={"message": str(e), "version": e.current})
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    cache.applicant_cache.invalidate(netid)
+    return result
+
+# Select (or with "selected": false unselect) many applicants in one UPDATE
+@app.post('/applicants:select', response_model=schemas.BulkResult, tags=['applicants'])
+async def select_applicants(request: schemas.SelectApplicants, db: AsyncSession = Depends(get_db)):
+    result = await db.run_sync(review.select_applicants, request)
+    cache.applicant_cache.invalidate(*request.netids)
+    return result
+
+# Show applicants a page at a time, ordered by netid
+# Pass the returned next_after back as ?after= to get the next page
+@app.get('/applicant', response_model=schemas.ApplicantPage, tags=['applicants'])
+async def all(limit: int = Query(queries.DEFAULT_PAGE_SIZE, ge=1, le=queries.MAX_PAGE_SIZE), after: Optional[str] = None,
+              fields: Optional[str] = None, team: Optional[str] = None, year: Optional[str] = None,
+              selected: Optional[bool] = None, db: AsyncSession = Depends(get_db)):
+    try:
+        columns = queries.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    rows = (await db.execute(queries.applicant_page_query(columns, limit, after, team, year, selected))).all()
+    return queries.applicant_page(columns, rows, limit)
+
+# Search an applicant by their netid
+@app.get('/applicant/{netid}', response_model=schemas.ShowApplicant, status_code=status.HTTP_202_ACCEPTED, tags=['applicants'])
+async def get_by_netid(netid: str, db: AsyncSession = Depends(get_db)):
+    applicant = await db.run_sync(cache.get_applicant, netid)
+    if not applicant:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Applicant with netid '{netid}' not found")
+    return applicant
+
+# Create an assignment
+@app.post('/assignment', status_code=status.HTTP_202_ACCEPTED, tags=['assignments'])
+async def create_assignment(request: schemas.AdditionalInfo, db: AsyncSession = Depends(get_db)):
+    if await db.get(models.AdditionalInfo, request.id):
+        raise HTTPException(status_code=status.HTTP_405_METHOD_NOT_ALLOWED, detail=f"Assignment with this id already exists")
+    new_assignment = models.AdditionalInfo(**request.dict())
+    db.add(new_assignment)
+    await db.commit()
+    cache.invalidate_task(request.id)
+    return new_assignment
+
+# Create many assignments at once, validated with set-based queries and inserted in one transaction
+@app.post('/assignments:batch', response_model=schemas.BatchResult, status_code=status.HTTP_201_CREATED, tags=['assignments'])
+async def create_assignment_batch(request: schemas.AssignmentBatch, db: AsyncSession = Depends(get_db)):
+    result = await db.run_sync(batch.create_assignments, request)
+    for item in request.items:
+        cache.invalidate_task(item.id)
+    if request.atomic and result.failed:
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=result.dict())
+    return result
+
+# Update many assignments at once, each item like a PATCH body with the id it changes
+@app.patch('/assignments:batch', response_model=schemas.BatchResult, tags=['assignments'])
+async def update_assignment_batch(request: schemas.AssignmentBatchUpdate, db: AsyncSession = Depends(get_db)):
+    result = await db.run_sync(batch.update_assignments, request)
+    cache.invalidate_tasks(item.id for item in request.items)
+    if request.atomic and result.failed:
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=result.dict())
+    return result
+
+# Delete many assignments at once, those still given to an applicant are refused
+@app.post('/assignments:delete', response_model=schemas.BatchResult, tags=['assignments'])
+async def delete_assignment_batch(request: schemas.AssignmentBatchDelete, db: AsyncSession = Depends(get_db)):
+    result = await db.run_sync(batch.delete_assignments, request)
+    cache.invalidate_tasks(request.ids)
+    if request.atomic and result.failed:
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=result.dict())
+    return result
+
+# Get everyone doing an assignment by task id
+@app.get('/assignment/{id}', response_model= schemas.ShowAdditionalInfo, status_code=status.HTTP_202_ACCEPTED ,tags=['assignments'])
+async def get_assignment_by_id(id: int, db: AsyncSession = Depends(get_db)):
+    assignment = (await db.execute(assignment_with_person().where(models.AdditionalInfo.id == id))).scalar()
+    if not assignment:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Assignment with the id '{id}' is not available")
+    return assignment
+
+# Get an assignment by assignment no
+@app.get('/assignments/{no}', response_model=List[schemas.ShowAdditionalInfo],status_code=status.HTTP_202_ACCEPTED, tags=['assignments'])
+async def get_by_assignment_number(no: str, db: AsyncSession = Depends(get_db)):
+    assignments = (await db.execute(assignment_with_person().where(models.AdditionalInfo.assignment_no == no))).scalars().all()
+    if len(assignments) == 0:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Assignment with the assignment number '{no}' does not exist")
+    return assignments
+
+# Update a task by task id
+@app.put('/assignment/{id}', status_code=status.HTTP_202_ACCEPTED, tags=['assignments'])
+async def update_assignment(id: int, request: schemas.UpdateAdditionalInfo, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(sql_update(models.AdditionalInfo).where(models.AdditionalInfo.id == id).values(**request.dict(), version=models.AdditionalInfo.version + 1))
+    if result.rowcount == 0:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Assignment with the id '{id}' does not exist")
+    await db.commit()
+    cache.invalidate_task(id)
+    return 'updated'
+
+# Update only the fields sent, 409 if the assignment changed since `version` was read
+@app.patch('/assignment/{id}', response_model=schemas.AssignmentVersion, tags=['assignments'])
+async def patch_assignment(id: int, request: schemas.AssignmentPatch, db: AsyncSession = Depends(get_db)):
+    try:
+        result = await db.run_sync(review.patch_assignment, id, request)
+    except review.NotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Assignment with the id '{id}' does not exist")
+    except review.VersionConflict as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail={"message": str(e), "version": e.current})
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    cache.invalidate_task(id)
+    return result
+
+# Mark many assignments submitted (or with "submitted": false not submitted) in one UPDATE
+@app.post('/assignments:submit', response_model=schemas.BulkResult, tags=['assignments'])
+async def submit_assignments(request: schemas.SubmitAssignments, db: AsyncSession = Depends(get_db)):
+    result = await db.run_sync(review.submit_assignments, request)
+    cache.invalidate_tasks(request.ids)
+    return result
+
+# Full-text search over names, majors, minors, teams and essay answers, best matches first
+@app.get('/search', response_model=List[schemas.SearchResult], tags=['applicants'])
+async def search_applicants(q: str, limit: int = Query(search.DEFAULT_LIMIT, ge=1, le=search.MAX_LIMIT), db: AsyncSession = Depends(get_db)):
+    try:
+        return await db.run_sync(search.search, q, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+# Submitted, not submitted and overdue counts overall and per team, read from the summary table
+@app.get('/overview', response_model=schemas.OverviewSummary, tags=['overview'])
+async def overview(db: AsyncSession = Depends(get_db)):
+    return await db.run_sync(summary.overview_summary)
+
+# Hit/miss/eviction counters of the netid lookup cache
+@app.get('/cache/stats', tags=['cache'])
+async def cache_stats():
+    return cache.applicant_cache.stats()
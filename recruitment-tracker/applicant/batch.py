@@ -0,0 +1,192 @@
+#*********************************************************************************#
+# This file contains the batch create, update and delete logic behind the        #
+# /applicants:batch, /assignments:batch and :delete endpoints, shared by the sync #
+# and async APIs                                                                  #
+#*********************************************************************************#
+from typing import Callable, Dict, Iterable, List, Set
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from . import models, review, schemas
+
+# Keeps IN (...) lists well below SQLite's bound parameter limit
+IN_CHUNK_SIZE = 500
+
+# Which of `values` are already present in `column`, one query per chunk rather than one per value
+def existing_values(db: Session, column, values: Iterable) -> Set:
+    values = list(set(values))
+    found = set()
+    for start in range(0, len(values), IN_CHUNK_SIZE):
+        found.update(db.execute(select(column).where(column.in_(values[start:start + IN_CHUNK_SIZE]))).scalars())
+    return found
+
+# Current version of each of `keys` that exists, chunked like existing_values
+def current_versions(db: Session, model, key_column, keys: Iterable) -> Dict:
+    keys = list(set(keys))
+    found = {}
+    for start in range(0, len(keys), IN_CHUNK_SIZE):
+        found.update(db.execute(select(key_column, model.version).where(key_column.in_(keys[start:start + IN_CHUNK_SIZE]))).all())
+    return found
+
+# Per-item results, invalid items are reported and the valid ones are written by `write` in one transaction.
+# `write` returns the error of every valid item it could not apply (None when it was), an item that fails
+# there counts as invalid, so with atomic=True the whole transaction is rolled back.
+# With atomic=True nothing is written unless every item is valid. `status` is "created", "updated" or "deleted"
+def _write_valid(db: Session, write: Callable[[List[dict]], List], items: List[dict], errors: List, keys: List[str],
+                 atomic: bool, status: str) -> schemas.BatchResult:
+    errors = list(errors)
+    positions = [index for index, error in enumerate(errors) if not error]
+    if positions and not (atomic and any(errors)):
+        for index, error in zip(positions, write([items[index] for index in positions])):
+            errors[index] = error
+        if atomic and any(errors):
+            db.rollback()
+        else:
+            db.commit()
+    failed = sum(1 for error in errors if error)
+    rejected = atomic and failed > 0
+    results = []
+    for index, (key, error) in enumerate(zip(keys, errors)):
+        if error:
+            results.append(schemas.BatchItemResult(index=index, key=key, status="error", detail=error))
+        elif rejected:
+            results.append(schemas.BatchItemResult(index=index, key=key, status="skipped", detail="Batch rejected, another item is invalid"))
+        else:
+            results.append(schemas.BatchItemResult(index=index, key=key, status=status))
+    done = 0 if rejected else len(items) - failed
+    return schemas.BatchResult(failed=failed, results=results, **{status: done})
+
+def _insert_valid(db: Session, table, items: List[dict], errors: List, keys: List[str], atomic: bool) -> schemas.BatchResult:
+    def write(valid):
+        db.execute(insert(table), valid)
+        return [None] * len(valid)
+    return _write_valid(db, write, items, errors, keys, atomic, "created")
+
+# Apply each item's fields with its own UPDATE, guarded by the version that was checked: a row changed
+# by someone else since then is reported as a conflict instead of being overwritten
+def _update_valid(db: Session, model, key_column, key_field: str, items: List[dict], errors: List, keys: List[str], atomic: bool) -> schemas.BatchResult:
+    def write(valid):
+        conflicts = []
+        for item in valid:
+            values = {field: value for field, value in item.items() if field not in (key_field, "version")}
+            result = db.execute(
+                update(model)
+                .where(key_column == item[key_field], model.version == item["version"])
+                .values(**values, version=model.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+            conflicts.append(None if result.rowcount else "Changed by someone else while the batch was applied, reload it and send it again")
+        return conflicts
+    return _write_valid(db, write, items, errors, keys, atomic, "updated")
+
+# Per-item errors of a batch update, before anything is written
+def _update_errors(items: List[dict], key_field: str, versions: Dict, label: str) -> List:
+    seen = set()
+    errors = []
+    for item in items:
+        key = item[key_field]
+        if key not in versions:
+            errors.append(f"{label} {key} does not exist")
+        elif key in seen:
+            errors.append(f"{label} {key} appears more than once in the batch")
+        elif not set(item) - {key_field, "version"}:
+            errors.append("Nothing to update")
+        elif versions[key] != item["version"]:
+            errors.append(str(review.VersionConflict(versions[key])))
+        else:
+            errors.append(None)
+        seen.add(key)
+    return errors
+
+# Delete the valid keys in chunks, in one transaction
+def _delete_valid(db: Session, model, key_column, keys: List, errors: List, atomic: bool) -> schemas.BatchResult:
+    def write(valid):
+        valid = [item["key"] for item in valid]
+        for start in range(0, len(valid), IN_CHUNK_SIZE):
+            db.execute(delete(model).where(key_column.in_(valid[start:start + IN_CHUNK_SIZE])).execution_options(synchronize_session=False))
+        return [None] * len(valid)
+    return _write_valid(db, write, [{"key": key} for key in keys], errors, [str(key) for key in keys], atomic, "deleted")
+
+# Per-item errors of a batch delete, before anything is deleted
+def _delete_errors(keys: List, existing: Set, label: str) -> List:
+    seen = set()
+    errors = []
+    for key in keys:
+        if key not in existing:
+            errors.append(f"{label} {key} does not exist")
+        elif key in seen:
+            errors.append(f"{label} {key} appears more than once in the batch")
+        else:
+            errors.append(None)
+        seen.add(key)
+    return errors
+
+def create_applicants(db: Session, request: schemas.ApplicantBatch) -> schemas.BatchResult:
+    items = [item.dict() for item in request.items]
+    taken = existing_values(db, models.Applicant.netid, (item["netid"] for item in items))
+    tasks = existing_values(db, models.AdditionalInfo.id, (item["task_id"] for item in items))
+    seen = set()
+    errors = []
+    for item in items:
+        if item["netid"] in taken:
+            errors.append(f"Applicant with netid {item['netid']} already exists")
+        elif item["netid"] in seen:
+            errors.append(f"Applicant with netid {item['netid']} appears more than once in the batch")
+        elif item["task_id"] not in tasks:
+            errors.append(f"Task ID {item['task_id']} does not exist")
+        else:
+            errors.append(None)
+        seen.add(item["netid"])
+    keys = [item["netid"] for item in items]
+    return _insert_valid(db, models.Applicant.__table__, items, errors, keys, request.atomic)
+
+def create_assignments(db: Session, request: schemas.AssignmentBatch) -> schemas.BatchResult:
+    items = [item.dict() for item in request.items]
+    taken = existing_values(db, models.AdditionalInfo.id, (item["id"] for item in items))
+    seen = set()
+    errors = []
+    for item in items:
+        if item["id"] in taken:
+            errors.append(f"Assignment with id {item['id']} already exists")
+        elif item["id"] in seen:
+            errors.append(f"Assignment with id {item['id']} appears more than once in the batch")
+        else:
+            errors.append(None)
+        seen.add(item["id"])
+    keys = [str(item["id"]) for item in items]
+    return _insert_valid(db, models.AdditionalInfo.__table__, items, errors, keys, request.atomic)
+
+# Only the fields sent for an item are updated, each item needs the version it is based on like PATCH
+def update_applicants(db: Session, request: schemas.ApplicantBatchUpdate) -> schemas.BatchResult:
+    items = [item.dict(exclude_unset=True) for item in request.items]
+    versions = current_versions(db, models.Applicant, models.Applicant.netid, (item["netid"] for item in items))
+    errors = _update_errors(items, "netid", versions, "Applicant with netid")
+    tasks = existing_values(db, models.AdditionalInfo.id, (item["task_id"] for item in items if "task_id" in item))
+    for index, item in enumerate(items):
+        if not errors[index] and "task_id" in item and item["task_id"] not in tasks:
+            errors[index] = f"Task ID {item['task_id']} does not exist"
+    keys = [item["netid"] for item in items]
+    return _update_valid(db, models.Applicant, models.Applicant.netid, "netid", items, errors, keys, request.atomic)
+
+def update_assignments(db: Session, request: schemas.AssignmentBatchUpdate) -> schemas.BatchResult:
+    items = [item.dict(exclude_unset=True) for item in request.items]
+    versions = current_versions(db, models.AdditionalInfo, models.AdditionalInfo.id, (item["id"] for item in items))
+    errors = _update_errors(items, "id", versions, "Assignment with id")
+    keys = [str(item["id"]) for item in items]
+    return _update_valid(db, models.AdditionalInfo, models.AdditionalInfo.id, "id", items, errors, keys, request.atomic)
+
+def delete_applicants(db: Session, request: schemas.ApplicantBatchDelete) -> schemas.BatchResult:
+    existing = existing_values(db, models.Applicant.netid, request.netids)
+    errors = _delete_errors(request.netids, existing, "Applicant with netid")
+    return _delete_valid(db, models.Applicant, models.Applicant.netid, request.netids, errors, request.atomic)
+
+# An assignment still given to an applicant is kept, the applicant would be left pointing at nothing
+def delete_assignments(db: Session, request: schemas.AssignmentBatchDelete) -> schemas.BatchResult:
+    existing = existing_values(db, models.AdditionalInfo.id, request.ids)
+    errors = _delete_errors(request.ids, existing, "Assignment with id")
+    in_use = existing_values(db, models.Applicant.task_id, request.ids)
+    for index, id in enumerate(request.ids):
+        if not errors[index] and id in in_use:
+            errors[index] = f"Assignment with id {id} is still given to an applicant"
+    return _delete_valid(db, models.AdditionalInfo, models.AdditionalInfo.id, request.ids, errors, request.atomic)
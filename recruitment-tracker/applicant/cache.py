@@ -0,0 +1,167 @@
+#*********************************************************************************#
+# This file contains the in-process cache of applicant records keyed by netid,    #
+# shared by the CLI helpers and the APIs                                          #
+#*********************************************************************************#
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, joinedload
+
+from . import models, queries
+
+# TRACKER_CACHE_SIZE=0 turns the cache off
+CACHE_SIZE = int(os.environ.get('TRACKER_CACHE_SIZE', 1024))
+CACHE_TTL = float(os.environ.get('TRACKER_CACHE_TTL', 300))
+
+# Keys whose invalidations are counted before the counters are reset, see LRUCache.token
+MAX_INVALIDATION_COUNTERS = 4096
+
+ASSIGNMENT_FIELDS = tuple(column.name for column in models.AdditionalInfo.__table__.columns)
+
+# Bounded LRU cache whose entries also expire `ttl` seconds after they were stored
+class LRUCache:
+    def __init__(self, maxsize: int = CACHE_SIZE, ttl: float = CACHE_TTL, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict() # key -> (expires at, value)
+        self._lock = threading.Lock() # Sync endpoints run on a thread pool
+        self.generation = None # Ingest generation of the DB the entries were read from
+        self._epoch = 0 # Bumped whenever more than a few known keys are invalidated at once
+        self._invalidations = {} # key -> times it was invalidated in this epoch
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self.clock():
+                if entry is not None:
+                    del self._entries[key]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    # Taken before reading a value from the DB and handed back to set, which ignores the value
+    # if the key was invalidated in between, as it may have been read before the write committed
+    def token(self, key):
+        with self._lock:
+            return self._epoch, self._invalidations.get(key, 0)
+
+    def set(self, key, value, token=None) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if token is not None and token != (self._epoch, self._invalidations.get(key, 0)):
+                return
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                self._invalidations[key] = self._invalidations.get(key, 0) + 1
+            if len(self._invalidations) > MAX_INVALIDATION_COUNTERS:
+                self._new_epoch()
+
+    # Drop every entry whose value matches, used when a write only knows a related id.
+    # Keys being read right now can't be matched yet, so every read in flight is left out of the cache
+    def invalidate_where(self, predicate: Callable[[object], bool]) -> None:
+        with self._lock:
+            for key in [key for key, (_, value) in self._entries.items() if predicate(value)]:
+                del self._entries[key]
+            self._new_epoch()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._new_epoch()
+
+    # Drop every entry if the DB was reloaded by an init, in this process or another one, since they were read
+    def check_generation(self, generation: int) -> None:
+        with self._lock:
+            if generation != self.generation:
+                self._entries.clear()
+                self._new_epoch()
+                self.generation = generation
+
+    def _new_epoch(self) -> None:
+        self._epoch += 1
+        self._invalidations.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+applicant_cache = LRUCache()
+
+# Plain dict of an applicant and its assignment, the shape of schemas.ShowApplicant
+def serialize_applicant(applicant: models.Applicant) -> dict:
+    record = {field: getattr(applicant, field) for field in queries.APPLICANT_FIELDS}
+    task = applicant.task
+    record["task"] = {field: getattr(task, field) for field in ASSIGNMENT_FIELDS} if task else None
+    return record
+
+# Read on every lookup, as a plain statement: building it through the ORM costs more than the cache saves
+GENERATION_QUERY = "SELECT generation FROM ingest_generation WHERE id = 1"
+
+# Ingest generation of the DB, 0 until the first init
+def current_generation(db: Session) -> int:
+    return db.connection().exec_driver_sql(GENERATION_QUERY).scalar() or 0
+
+# Bump the ingest generation inside the transaction writing the new rows
+def bump_generation(conn) -> None:
+    table = models.IngestGeneration.__table__
+    conn.execute(
+        sqlite_insert(table).values(id=1, generation=1)
+        .on_conflict_do_update(index_elements=[table.c.id], set_={"generation": table.c.generation + 1})
+    )
+
+# Read an applicant from the DB and cache it, None if there is no such netid
+def load_applicant(db: Session, netid: str) -> Optional[dict]:
+    token = applicant_cache.token(netid)
+    applicant = db.query(models.Applicant).options(joinedload(models.Applicant.task)).filter(models.Applicant.netid == netid).first()
+    if not applicant:
+        return None
+    record = serialize_applicant(applicant)
+    applicant_cache.set(netid, record, token)
+    return record
+
+# Cached applicant record, going to the DB on a miss. Every lookup reads the ingest generation first,
+# so an init run by another process (the CLI, or another API worker) is seen straight away
+def get_applicant(db: Session, netid: str) -> Optional[dict]:
+    if applicant_cache.maxsize <= 0:
+        return load_applicant(db, netid)
+    applicant_cache.check_generation(current_generation(db))
+    record = applicant_cache.get(netid)
+    if record is None:
+        record = load_applicant(db, netid)
+    return record
+
+# Forget the applicants doing an assignment after that assignment changed
+def invalidate_task(task_id: int) -> None:
+    applicant_cache.invalidate_where(lambda record: record["task_id"] == task_id)
+
+# Same for many assignments, in one pass over the cache
+def invalidate_tasks(task_ids: Iterable[int]) -> None:
+    task_ids = set(task_ids)
+    applicant_cache.invalidate_where(lambda record: record["task_id"] in task_ids)
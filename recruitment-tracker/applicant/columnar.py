@@ -0,0 +1,158 @@
+#*********************************************************************************#
+# This file contains the columnar assignment reader: pyarrow parses the CSV into   #
+# column arrays and resolves teams and dates a whole block at a time              #
+#*********************************************************************************#
+import csv
+from bisect import bisect_left, bisect_right, insort
+from functools import partial
+from itertools import accumulate
+from typing import Iterator, List, Optional
+
+from .ingest import ASSIGNMENT_COLUMN_COUNT, TEAM_COLUMNS, AssignmentRecord, RowError, assignment_record, read_csv_assignment, string_to_date
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+# Bytes of CSV turned into one block of columns
+BLOCK_SIZE = 1 << 22
+
+# Build records without going through the NamedTuple constructor, which is measurably slower per row
+_record = partial(tuple.__new__, AssignmentRecord)
+
+# Python values of an array with few distinct values (teams, assignment numbers, dates), each converted once
+def _decoded(array) -> list:
+    encoded = array.dictionary_encode()
+    values = encoded.dictionary.to_pylist()
+    return list(map(values.__getitem__, encoded.indices.fill_null(0).to_pylist()))
+
+# Index into TEAM_COLUMNS of the first team column filled in on every row, null when none is
+def _team_choice(columns):
+    choice = pa.nulls(len(columns[0]), pa.int8())
+    for position in reversed(range(len(TEAM_COLUMNS))):
+        filled = pc.not_equal(columns[TEAM_COLUMNS[position][0]], "")
+        choice = pc.if_else(filled, pa.scalar(position, pa.int8()), choice)
+    return choice
+
+def _date_or_none(value: str):
+    try:
+        return string_to_date(value)
+    except ValueError:
+        return None
+
+# Dates that aren't YYYY-MM-DD come back as nulls. Only the distinct values are parsed, with the same
+# strptime as the row reader: pyarrow's own strptime accepts "2022-02-30" and rolls it over to March
+def _dates(column):
+    encoded = column.dictionary_encode()
+    dates = pa.array([_date_or_none(value) for value in encoded.dictionary.to_pylist()], pa.date32())
+    return pc.take(dates, encoded.indices)
+
+# Data row number of the row at `position` among the rows pyarrow kept, given the sorted numbers of the rows it skipped
+def _row_number(position: int, skipped: List[int]) -> int:
+    number = position
+    while position + bisect_right(skipped, number) != number:
+        number = position + bisect_right(skipped, number)
+    return number
+
+# Columns of the header row, spreadsheet exports often add empty columns after the ones the tracker reads
+def _header_width(csvfile) -> int:
+    with open(csvfile, 'r', newline='') as file:
+        return max(len(next(csv.reader(file), [])), ASSIGNMENT_COLUMN_COUNT)
+
+# Pyarrow rows before the row numbered `number` (data rows counted from 1), given the sorted numbers of the rows it skipped
+def _rows_before(number: int, skipped: List[int]) -> int:
+    return number - 1 - bisect_left(skipped, number)
+
+# Stream the records of an assignment CSV, parsed block by block with pyarrow when it is installed
+# and row by row with read_csv_assignment otherwise. Malformed rows are skipped and reported in `errors`
+def read_csv_assignment_columnar(csvfile, errors: Optional[List[RowError]] = None) -> Iterator[AssignmentRecord]:
+    if pa is None:
+        yield from read_csv_assignment(csvfile, errors)
+        return
+    if errors is None:
+        errors = []
+    skipped = []
+    # (row number, record) of rows wider or narrower than the header that the row reader would still take,
+    # pyarrow only parses rows as wide as the header so they are parsed here and put back in file order
+    uneven = []
+
+    def invalid_row(row):
+        # row.number counts the header line, it is None when pyarrow can't tell
+        number = row.number - 1 if row.number else 0
+        if number:
+            insort(skipped, number)
+        if row.text == "":
+            return "skip" # Blank line, such as the one many exports end with
+        if row.actual_columns < ASSIGNMENT_COLUMN_COUNT:
+            errors.append(RowError(str(csvfile), number, f"Expected {ASSIGNMENT_COLUMN_COUNT} columns, found {row.actual_columns}", (row.text,)))
+            return "skip"
+        values = next(csv.reader([row.text]))
+        try:
+            insort(uneven, (number, assignment_record(values)))
+        except ValueError as e:
+            errors.append(RowError(str(csvfile), number, str(e), tuple(values)))
+        return "skip"
+
+    # Uneven rows that come before pyarrow's row at position `end`, removed from `uneven`
+    def uneven_before(end: int):
+        count = 0
+        while count < len(uneven) and _rows_before(uneven[count][0], skipped) <= end:
+            count += 1
+        taken = uneven[:count]
+        del uneven[:count]
+        return [(_rows_before(number, skipped), record) for number, record in taken]
+
+    names = [f"column{i}" for i in range(_header_width(csvfile))]
+    reader = pa_csv.open_csv(
+        csvfile,
+        read_options=pa_csv.ReadOptions(skip_rows=1, column_names=names, block_size=BLOCK_SIZE),
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True, invalid_row_handler=invalid_row),
+        # Everything is read as text so a bad date becomes an error report entry rather than a failed read
+        convert_options=pa_csv.ConvertOptions(column_types={name: pa.string() for name in names}),
+    )
+    teams = pa.array([team for _, team in TEAM_COLUMNS])
+    offset = 0
+    for batch in reader:
+        columns = batch.columns
+        choice = _team_choice(columns)
+        date_given = _dates(columns[6])
+        date_due = _dates(columns[7])
+        valid = pc.and_(pc.and_(choice.is_valid(), date_given.is_valid()), date_due.is_valid())
+        if not pc.all(valid).as_py():
+            for index in pc.indices_nonzero(pc.invert(valid)).to_pylist():
+                values = tuple(column[index].as_py() for column in columns)
+                if not choice[index].is_valid:
+                    reason = "No team assigned"
+                elif not date_given[index].is_valid:
+                    reason = f"Date given '{values[6]}' is not a YYYY-MM-DD date"
+                else:
+                    reason = f"Due date '{values[7]}' is not a YYYY-MM-DD date"
+                errors.append(RowError(str(csvfile), _row_number(offset + index + 1, skipped), reason, values))
+            columns = [column.filter(valid) for column in columns]
+            choice, date_given, date_due = choice.filter(valid), date_given.filter(valid), date_due.filter(valid)
+        records = map(_record, zip(
+            columns[0].to_pylist(),
+            columns[1].to_pylist(),
+            _decoded(pc.take(teams, choice)),
+            _decoded(pc.choose(choice, *[columns[column] for column, _ in TEAM_COLUMNS])),
+            _decoded(date_given),
+            _decoded(date_due),
+        ))
+        inserted = uneven_before(offset + batch.num_rows) if uneven else []
+        if inserted:
+            # Each uneven record goes after the valid rows of the block that come before it
+            records = list(records)
+            valid_before = list(accumulate(valid.to_pylist(), initial=0))
+            merged, start = [], 0
+            for position, record in inserted:
+                end = valid_before[max(position - offset, 0)]
+                merged += records[start:end]
+                merged.append(record)
+                start = end
+            records = merged + records[start:]
+        offset += batch.num_rows
+        yield from records
+    yield from (record for _, record in uneven)
@@ -1,10 +1,28 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-SQLALCHEMY_DATABASE_URL = 'sqlite:///./applicant.db'
+# TRACKER_DATABASE_URL points the app at another DB, e.g. for benchmarks
+SQLALCHEMY_DATABASE_URL = os.environ.get('TRACKER_DATABASE_URL', 'sqlite:///./applicant.db')
+
+# WAL lets readers carry on while a writer commits, and writers wait for the lock instead of failing straight away
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+)
+
+# Applied to every new SQLite connection, sync or async
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
 
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread":False})
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", set_sqlite_pragmas)
 
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
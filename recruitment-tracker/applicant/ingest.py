@@ -0,0 +1,474 @@
+#*********************************************************************************#
+# This file contains the ingest engine that loads the CSV exports into the DB     #
+#*********************************************************************************#
+import csv
+import glob
+import hashlib
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from functools import lru_cache, partial
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from . import migrations, models, search, summary
+from .cache import applicant_cache, bump_generation
+from .database import engine
+
+# Number of rows sent to the DB per executemany call
+DEFAULT_BATCH_SIZE = 1000
+
+# Columns that come from the CSV files, the only ones an incremental ingest may update
+CSV_APPLICANT_COLUMNS = (
+    "name", "email", "year", "major", "smajor", "teams", "minor", "sminor", "team_interest", "value_add", "hopes", "task_id", "row_hash",
+)
+CSV_ASSIGNMENT_COLUMNS = ("assignment_no", "team_assigned", "date_given", "date_due")
+
+# Columns a row of each CSV needs
+ASSIGNMENT_COLUMN_COUNT = 8
+SUBMISSION_COLUMN_COUNT = 17
+
+# Assignment CSV columns holding the assignment number for each team
+TEAM_COLUMNS = (
+    (2, "Quantitative Research"),
+    (3, "Strategy Implementation"),
+    (4, "Software Development"),
+    (5, "Business"),
+)
+
+# Submission CSV columns kept by the reader, the GPA/LinkedIn/time commitment columns are dropped
+SUBMISSION_COLUMNS = itemgetter(3, 4, 2, 5, 6, 7, 12, 8, 9, 13, 15, 16)
+
+# One row of the assignment CSV
+class AssignmentRecord(NamedTuple):
+    name: str
+    email: str
+    team_assigned: str
+    assignment_no: str
+    date_given: date
+    date_due: date
+
+# One row of the submission CSV
+class SubmissionRecord(NamedTuple):
+    name: str
+    netid: str
+    email: str
+    year: str
+    major: str
+    smajor: str
+    teams: str
+    minor: str
+    sminor: str
+    team_interest: str
+    value_add: str
+    hopes: str
+
+# A CSV row left out of the ingest: file, data row number (header excluded), reason and the raw values
+class RowError(NamedTuple):
+    file: str
+    row: int
+    reason: str
+    values: Tuple[str, ...]
+
+# A joined row ready to be written: the assignment, its submission and the content hash of both
+JoinedRow = Tuple[AssignmentRecord, SubmissionRecord, str]
+
+# Summary of an ingest run
+class IngestStats:
+    def __init__(self, rows: int, seconds: float, unchanged: int = 0, duplicates: int = 0, files_unchanged: bool = False):
+        self.rows = rows
+        self.seconds = seconds
+        self.unchanged = unchanged
+        self.duplicates = duplicates # Rows skipped because an earlier row had the same netid
+        self.files_unchanged = files_unchanged # An incremental run found the same files as last time and read no row
+        self.errors: List[RowError] = [] # Malformed CSV rows that were left out
+
+    @property
+    def rows_per_second(self) -> float:
+        # Unchanged rows were still read, hashed and compared
+        processed = self.rows + self.unchanged
+        if self.seconds <= 0:
+            return float(processed)
+        return processed / self.seconds
+
+# Convert strings to datetime.date objects
+# A file only holds a handful of distinct dates, so each one is parsed once
+@lru_cache(maxsize=4096)
+def string_to_date(date_string: str) -> date:
+    d_format = "%Y-%m-%d"
+    date_obj = datetime.strptime(date_string, d_format).date()
+    return date_obj
+
+def _parse_date(value: str, column: str) -> date:
+    try:
+        return string_to_date(value)
+    except ValueError:
+        raise ValueError(f"{column} '{value}' is not a YYYY-MM-DD date") from None
+
+# Resolve one row of the assignment CSV, raising ValueError with the reason when it is malformed
+def assignment_record(row: List[str]) -> AssignmentRecord:
+    if len(row) < ASSIGNMENT_COLUMN_COUNT:
+        raise ValueError(f"Expected {ASSIGNMENT_COLUMN_COUNT} columns, found {len(row)}")
+    # Figuring out assigned teams, the first team column that is filled in wins
+    for column, team_assigned in TEAM_COLUMNS:
+        if row[column] != "":
+            break
+    else:
+        raise ValueError("No team assigned")
+    return AssignmentRecord(
+        row[0],
+        row[1],
+        team_assigned,
+        row[column],
+        _parse_date(row[6], "Date given"),
+        _parse_date(row[7], "Due date"),
+    )
+
+# Stream the rows of an assignment CSV, one record at a time
+# Malformed rows are skipped and, when an `errors` list is passed, reported in it
+def read_csv_assignment(csvfile, errors: Optional[List[RowError]] = None) -> Iterator[AssignmentRecord]:
+    with open(csvfile, 'r', newline='') as file:
+        reader = csv.reader(file)
+        next(reader, None) # Skip the column headers
+        for number, row in enumerate(reader, start=1):
+            if not row:
+                continue # Blank line, such as the one many exports end with
+            try:
+                record = assignment_record(row)
+            except ValueError as e:
+                if errors is not None:
+                    errors.append(RowError(str(csvfile), number, str(e), tuple(row)))
+                continue
+            yield record
+
+# Stream the rows of a submission CSV, one record at a time
+def read_csv_submission(csvfile, errors: Optional[List[RowError]] = None) -> Iterator[SubmissionRecord]:
+    with open(csvfile, 'r', newline='') as file:
+        reader = csv.reader(file)
+        next(reader, None) # Skip the column headers
+        for number, row in enumerate(reader, start=1):
+            if not row:
+                continue # Blank line, such as the one many exports end with
+            if len(row) < SUBMISSION_COLUMN_COUNT:
+                if errors is not None:
+                    errors.append(RowError(str(csvfile), number, f"Expected {SUBMISSION_COLUMN_COUNT} columns, found {len(row)}", tuple(row)))
+                continue
+            yield SubmissionRecord._make(SUBMISSION_COLUMNS(row))
+
+# Write malformed rows to a CSV report, one line per row with its raw values at the end
+def write_error_report(errors: Iterable[RowError], path) -> None:
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(["file", "row", "reason", "values"])
+        for error in errors:
+            writer.writerow([error.file, error.row, error.reason, *error.values])
+
+# Index assignments by (name, email) so that every submission is matched in O(1).
+# The assignment file is the small one, the submissions carrying the essays are streamed past the index
+def index_assignments(assignments: Iterable[AssignmentRecord]) -> Dict[Tuple[str, str], List[AssignmentRecord]]:
+    index = {}
+    for assignment in assignments:
+        index.setdefault((assignment.name, assignment.email), []).append(assignment)
+    return index
+
+# Join submissions to indexed assignments in a single pass, yielding (assignment, submission) pairs
+def join(submissions: Iterable[SubmissionRecord], index: Dict[Tuple[str, str], List[AssignmentRecord]]):
+    for submission in submissions:
+        # Making sure assignments are given to those who pass initial screening
+        for assignment in index.get((submission.name, submission.email), ()):
+            yield assignment, submission
+
+# Attach the content hash to every joined (assignment, submission) pair
+def hashed(pairs: Iterable[Tuple[AssignmentRecord, SubmissionRecord]]) -> Iterator[JoinedRow]:
+    for assignment, submission in pairs:
+        yield assignment, submission, row_hash(assignment, submission)
+
+# Content hash of a whole CSV file, read in chunks so large exports are never held in memory
+def file_digest(csvfile) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(csvfile, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Content hash of a list of CSV files, a single file keeps its own digest
+def files_digest(csvfiles: Sequence[str]) -> str:
+    if len(csvfiles) == 1:
+        return file_digest(csvfiles[0])
+    digest = hashlib.blake2b(digest_size=16)
+    for csvfile in csvfiles:
+        digest.update(file_digest(csvfile).encode())
+    return digest.hexdigest()
+
+# Content hash of a joined CSV row, used by incremental ingest to skip unchanged rows
+def row_hash(assignment: AssignmentRecord, submission: SubmissionRecord) -> str:
+    content = "\x1f".join(map(str, assignment + submission))
+    return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+def _assignment_row(task_id: int, assignment: AssignmentRecord) -> dict:
+    return {
+        "id": task_id,
+        "assignment_no": assignment.assignment_no,
+        "team_assigned": assignment.team_assigned,
+        "date_given": assignment.date_given,
+        "date_due": assignment.date_due,
+    }
+
+def _applicant_row(task_id: int, submission: SubmissionRecord, content_hash: str) -> dict:
+    return {
+        "name": submission.name,
+        "netid": submission.netid,
+        "email": submission.email,
+        "year": submission.year,
+        "major": submission.major,
+        "smajor": submission.smajor,
+        "teams": submission.teams,
+        "minor": submission.minor,
+        "sminor": submission.sminor,
+        "team_interest": submission.team_interest,
+        "value_add": submission.value_add,
+        "hopes": submission.hopes,
+        "task_id": task_id,
+        "row_hash": content_hash,
+    }
+
+# Overwrite the tables with the joined rows, bulk inserting them inside one transaction
+def ingest(assignments: Iterable[AssignmentRecord], submissions: Iterable[SubmissionRecord], batch_size: int = DEFAULT_BATCH_SIZE) -> IngestStats:
+    start = time.perf_counter()
+    index = index_assignments(assignments)
+    stats = load(hashed(join(submissions, index)), batch_size)
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+# Write joined rows to freshly created tables, an applicant whose netid was already written is skipped.
+# The tables are dropped and recreated in the same transaction as the inserts, so if reading the rows fails
+# halfway the previous tables are left as they were, and readers see them until the new ones are committed
+def load(rows: Iterable[JoinedRow], batch_size: int = DEFAULT_BATCH_SIZE) -> IngestStats:
+    if batch_size < 1:
+        raise ValueError("Batch size must be at least 1")
+    start = time.perf_counter()
+    # Every table but the ingest generation, which carries on counting
+    generation = models.IngestGeneration.__table__
+    tables = [table for table in models.Base.metadata.sorted_tables if table is not generation]
+
+    insert_assignments = insert(models.AdditionalInfo.__table__)
+    insert_applicants = insert(models.Applicant.__table__)
+    assignment_rows = []
+    applicant_rows = []
+    written = 0
+    duplicates = 0
+    seen = set()
+    with engine.begin() as conn:
+        # pysqlite only opens a transaction on its own before an INSERT/UPDATE/DELETE, too late for the DDL
+        conn.exec_driver_sql("BEGIN")
+        # Overwriting the tables by dropping previous ones
+        models.Base.metadata.drop_all(conn, tables=tables)
+        models.Base.metadata.create_all(conn)
+        search.drop_insert_trigger(conn)
+        summary.drop_insert_triggers(conn)
+        for assignment, submission, content_hash in rows:
+            if submission.netid in seen:
+                duplicates += 1
+                continue
+            seen.add(submission.netid)
+            # Task ids are handed out here so both tables can be written without a refresh
+            task_id = len(seen)
+            assignment_rows.append(_assignment_row(task_id, assignment))
+            applicant_rows.append(_applicant_row(task_id, submission, content_hash))
+            if len(applicant_rows) >= batch_size:
+                _flush(conn, insert_assignments, assignment_rows, insert_applicants, applicant_rows)
+                written += batch_size
+                assignment_rows, applicant_rows = [], []
+        if applicant_rows:
+            _flush(conn, insert_assignments, assignment_rows, insert_applicants, applicant_rows)
+            written += len(applicant_rows)
+        search.create_index(conn)
+        search.rebuild(conn)
+        summary.create_triggers(conn)
+        summary.rebuild(conn)
+        # The tables were just created at the current schema, so the next upgrade has nothing to migrate
+        conn.exec_driver_sql(f"PRAGMA user_version = {migrations.SCHEMA_VERSION}")
+        bump_generation(conn)
+    applicant_cache.clear()
+    return IngestStats(written, time.perf_counter() - start, duplicates=duplicates)
+
+# Upsert only new and changed rows keyed on netid, leaving reviewer edits and unchanged rows alone
+def ingest_incremental(assignments: Iterable[AssignmentRecord], submissions: Iterable[SubmissionRecord], batch_size: int = DEFAULT_BATCH_SIZE) -> IngestStats:
+    start = time.perf_counter()
+    index = index_assignments(assignments)
+    stats = load_incremental(hashed(join(submissions, index)), batch_size)
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+# Upsert joined rows into the existing tables, only the first row seen for a netid counts
+def load_incremental(rows: Iterable[JoinedRow], batch_size: int = DEFAULT_BATCH_SIZE) -> IngestStats:
+    if batch_size < 1:
+        raise ValueError("Batch size must be at least 1")
+    start = time.perf_counter()
+    migrations.upgrade(engine)
+
+    applicants = models.Applicant.__table__
+    assignments_table = models.AdditionalInfo.__table__
+    # selected/comments and submitted/assignment_comments are reviewer edits, they are never overwritten.
+    # Rows that change get a new version, so a reviewer's PATCH based on the old row is refused
+    upsert_applicants = sqlite_insert(applicants)
+    upsert_applicants = upsert_applicants.on_conflict_do_update(
+        index_elements=[applicants.c.netid],
+        set_={**{column: upsert_applicants.excluded[column] for column in CSV_APPLICANT_COLUMNS}, "version": applicants.c.version + 1},
+    )
+    upsert_assignments = sqlite_insert(assignments_table)
+    upsert_assignments = upsert_assignments.on_conflict_do_update(
+        index_elements=[assignments_table.c.id],
+        set_={**{column: upsert_assignments.excluded[column] for column in CSV_ASSIGNMENT_COLUMNS}, "version": assignments_table.c.version + 1},
+    )
+
+    assignment_rows = []
+    applicant_rows = []
+    written = 0
+    unchanged = 0
+    duplicates = 0
+    seen = set()
+    with engine.begin() as conn:
+        existing = {
+            netid: (content_hash, task_id)
+            for netid, content_hash, task_id in conn.execute(
+                select(applicants.c.netid, applicants.c.row_hash, applicants.c.task_id)
+            )
+        }
+        next_task_id = (conn.execute(select(func.max(assignments_table.c.id))).scalar() or 0) + 1
+        for assignment, submission, content_hash in rows:
+            if submission.netid in seen:
+                duplicates += 1
+                continue
+            seen.add(submission.netid)
+            current = existing.get(submission.netid)
+            if current is not None and current[0] == content_hash:
+                unchanged += 1
+                continue
+            if current is not None and current[1] is not None:
+                task_id = current[1]
+            else:
+                task_id = next_task_id
+                next_task_id += 1
+            assignment_rows.append(_assignment_row(task_id, assignment))
+            applicant_rows.append(_applicant_row(task_id, submission, content_hash))
+            if len(applicant_rows) >= batch_size:
+                _flush(conn, upsert_assignments, assignment_rows, upsert_applicants, applicant_rows)
+                written += batch_size
+                assignment_rows, applicant_rows = [], []
+        if applicant_rows:
+            _flush(conn, upsert_assignments, assignment_rows, upsert_applicants, applicant_rows)
+            written += len(applicant_rows)
+        if written:
+            bump_generation(conn)
+    if written:
+        applicant_cache.clear()
+    return IngestStats(written, time.perf_counter() - start, unchanged, duplicates)
+
+def _flush(conn, insert_assignments, assignment_rows, insert_applicants, applicant_rows) -> None:
+    conn.execute(insert_assignments, assignment_rows)
+    conn.execute(insert_applicants, applicant_rows)
+
+# Pair up the CSV files found in `paths`, each path being a file, a directory or a glob such as "cycles/*.csv".
+# Files pair up when their names only differ by "assignment"/"submission", e.g. fall_assignment.csv and
+# fall_submission.csv. Two plain files that don't follow the naming are taken as (assignment, submission).
+def find_pairs(paths: Sequence[str]) -> List[Tuple[str, str]]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            matches = sorted(glob.glob(os.path.join(path, "*.csv")))
+        elif any(character in path for character in "*?["):
+            matches = sorted(glob.glob(path))
+        elif os.path.isfile(path):
+            matches = [path]
+        else:
+            raise ValueError(f"'{path}' does not exist")
+        if not matches:
+            raise ValueError(f"No CSV files found in '{path}'")
+        files += matches
+    groups = {}
+    for csvfile in dict.fromkeys(files):
+        name = os.path.basename(csvfile).lower()
+        kind = "assignment" if "assignment" in name else "submission" if "submission" in name else None
+        if kind is None:
+            groups = None
+            break
+        key = (os.path.dirname(csvfile), re.sub("assignment|submission", "", name))
+        groups.setdefault(key, {}).setdefault(kind, []).append(csvfile)
+    if groups is None or any(len(group.get("assignment", ())) != 1 or len(group.get("submission", ())) != 1 for group in groups.values()):
+        if len(files) == 2 and all(os.path.isfile(path) for path in paths):
+            return [(files[0], files[1])]
+        raise ValueError("Could not pair up the CSV files, name them like <cycle>_assignment.csv and <cycle>_submission.csv: " + ", ".join(files))
+    return [(groups[key]["assignment"][0], groups[key]["submission"][0]) for key in sorted(groups)]
+
+# Parse, join and hash one CSV pair as a stream of joined rows, malformed rows of both files go to `errors`
+def stream_pair(pair: Tuple[str, str], errors: List[RowError], columnar: bool = False) -> Iterator[JoinedRow]:
+    file_assignment, file_submission = pair
+    if columnar:
+        # pyarrow is only imported when the columnar reader is asked for
+        from .columnar import read_csv_assignment_columnar as read_assignments
+    else:
+        read_assignments = read_csv_assignment
+    index = index_assignments(read_assignments(file_assignment, errors))
+    return hashed(join(read_csv_submission(file_submission, errors), index))
+
+# The work handed to each process of the pool: the joined rows and the malformed rows of one pair
+def parse_pair(pair: Tuple[str, str], columnar: bool = False) -> Tuple[List[JoinedRow], List[RowError]]:
+    errors = []
+    rows = list(stream_pair(pair, errors, columnar))
+    return rows, errors
+
+# Joined rows of every pair in the order given, malformed rows go to `errors`.
+# One worker streams the rows straight from the files. A pool of up to `workers` processes parses
+# whole pairs, so a pair's rows are held in memory until they have been written
+def parse_pairs(pairs: Sequence[Tuple[str, str]], errors: List[RowError], workers: int = 1, columnar: bool = False) -> Iterator[JoinedRow]:
+    if workers <= 1 or len(pairs) <= 1:
+        for pair in pairs:
+            yield from stream_pair(pair, errors, columnar)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(pairs))) as pool:
+        for rows, pair_errors in pool.map(partial(parse_pair, columnar=columnar), pairs):
+            errors.extend(pair_errors)
+            yield from rows
+
+# Ingest CSV pairs, parsed by a pool of `workers` processes and written by this one.
+# An incremental run on files that are unchanged since the last ingest is a no-op
+def ingest_pairs(pairs: Sequence[Tuple[str, str]], batch_size: int = DEFAULT_BATCH_SIZE, incremental: bool = False,
+                 workers: int = 1, columnar: bool = False) -> IngestStats:
+    if not pairs:
+        raise ValueError("No CSV files to ingest")
+    start = time.perf_counter()
+    digests = {
+        "assignment": files_digest([file_assignment for file_assignment, _ in pairs]),
+        "submission": files_digest([file_submission for _, file_submission in pairs]),
+    }
+    errors = []
+    rows = parse_pairs(pairs, errors, workers, columnar)
+    if incremental:
+        migrations.upgrade(engine)
+        with engine.connect() as conn:
+            stored = {kind: (digest, rows) for kind, digest, rows in conn.execute(select(models.SourceFile.__table__))}
+        if all(kind in stored and stored[kind][0] == digest for kind, digest in digests.items()):
+            return IngestStats(0, time.perf_counter() - start, stored["submission"][1] or 0, files_unchanged=True)
+        stats = load_incremental(rows, batch_size)
+    else:
+        # load() replaces the tables in one transaction, so a file that can't be read leaves the DB untouched
+        stats = load(rows, batch_size)
+    stats.errors = sorted(errors)
+    source_files = models.SourceFile.__table__
+    with engine.begin() as conn:
+        conn.execute(source_files.delete())
+        conn.execute(insert(source_files), [
+            {"kind": kind, "digest": digest, "rows": stats.rows + stats.unchanged} for kind, digest in digests.items()
+        ])
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+# Ingest a pair of CSV files
+def ingest_files(file_assignment, file_submission, batch_size: int = DEFAULT_BATCH_SIZE, incremental: bool = False, columnar: bool = False) -> IngestStats:
+    return ingest_pairs([(file_assignment, file_submission)], batch_size, incremental, columnar=columnar)
@@ -0,0 +1,219 @@
+#*********************************************************************************#
+# This file contains hooks for measuring what the app sends to the database and   #
+# how long API requests and CLI commands take                                     #
+#*********************************************************************************#
+import cProfile
+import json
+import os
+import pstats
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Counts the SQL statements an engine executes while the block runs
+#   with QueryCounter(engine, expected=2) as counter: ...
+# raises AssertionError on exit if `expected` is given and a different number ran
+class QueryCounter:
+    def __init__(self, engine: Engine, expected: Optional[int] = None):
+        self.engine = engine
+        self.expected = expected
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+        if exc_type is None and self.expected is not None and self.count != self.expected:
+            raise AssertionError(
+                f"Expected {self.expected} SQL statements, {self.count} ran:\n" + "\n".join(self.statements)
+            )
+        return False
+
+# Opt-in metrics: TRACKER_METRICS=1 times every SQL statement and API request and serves them on /metrics
+METRICS_ENABLED = os.environ.get('TRACKER_METRICS', '') not in ('', '0')
+
+# Upper bounds of the request latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# SQL time of the request being served, a one item list so threads running sync endpoints can add to it
+_request_sql = ContextVar("request_sql", default=None)
+
+# Statement text used as a metric label: whitespace collapsed and IN lists of any length folded into one
+def statement_label(statement: str) -> str:
+    statement = " ".join(statement.split())
+    return re.sub(r"\(\?(, \?)+\)", "(?, ...)", statement)
+
+# Thread-safe registry of SQL statement timings and per-route request latencies
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.statements: Dict[str, List[float]] = {} # label -> [count, seconds]
+        self.requests: Dict[Tuple[str, str, int], List[float]] = {} # (method, route, status) -> [bucket counts..., count, seconds, SQL seconds]
+
+    def observe_statement(self, statement: str, seconds: float) -> None:
+        label = statement_label(statement)
+        with self._lock:
+            entry = self.statements.setdefault(label, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, sql_seconds: float) -> None:
+        with self._lock:
+            entry = self.requests.setdefault((method, route, status), [0] * len(LATENCY_BUCKETS) + [0, 0.0, 0.0])
+            bucket = bisect_left(LATENCY_BUCKETS, seconds)
+            if bucket < len(LATENCY_BUCKETS): # Slower requests only show up in the +Inf bucket
+                entry[bucket] += 1
+            entry[-3] += 1
+            entry[-2] += seconds
+            entry[-1] += sql_seconds
+
+    def reset(self) -> None:
+        with self._lock:
+            self.statements.clear()
+            self.requests.clear()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            statements = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)
+            requests = sorted(self.requests.items())
+            return {
+                "sql": {
+                    "statements": sum(count for _, (count, _) in statements),
+                    "seconds": sum(seconds for _, (_, seconds) in statements),
+                    "by_statement": [{"statement": label, "count": count, "seconds": seconds} for label, (count, seconds) in statements],
+                },
+                "requests": [
+                    {"method": method, "route": route, "status": status, "count": entry[-3], "seconds": entry[-2], "sql_seconds": entry[-1]}
+                    for (method, route, status), entry in requests
+                ],
+            }
+
+    # Prometheus text exposition format
+    def to_prometheus(self) -> str:
+        with self._lock:
+            lines = [
+                "# HELP tracker_sql_statements_total SQL statements executed.",
+                "# TYPE tracker_sql_statements_total counter",
+            ]
+            lines += [f'tracker_sql_statements_total{{statement="{_escape(label)}"}} {count}' for label, (count, _) in self.statements.items()]
+            lines += [
+                "# HELP tracker_sql_seconds_total Time spent executing SQL statements.",
+                "# TYPE tracker_sql_seconds_total counter",
+            ]
+            lines += [f'tracker_sql_seconds_total{{statement="{_escape(label)}"}} {seconds}' for label, (_, seconds) in self.statements.items()]
+            lines += [
+                "# HELP tracker_http_request_duration_seconds API request latency.",
+                "# TYPE tracker_http_request_duration_seconds histogram",
+            ]
+            for (method, route, status), entry in self.requests.items():
+                labels = f'method="{method}",route="{_escape(route)}",status="{status}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, entry):
+                    cumulative += count
+                    lines.append(f'tracker_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'tracker_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {entry[-3]}')
+                lines.append(f"tracker_http_request_duration_seconds_sum{{{labels}}} {entry[-2]}")
+                lines.append(f"tracker_http_request_duration_seconds_count{{{labels}}} {entry[-3]}")
+            lines += [
+                "# HELP tracker_http_request_sql_seconds_total Part of the API request latency spent executing SQL.",
+                "# TYPE tracker_http_request_sql_seconds_total counter",
+            ]
+            lines += [
+                f'tracker_http_request_sql_seconds_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {entry[-1]}'
+                for (method, route, status), entry in self.requests.items()
+            ]
+            return "\n".join(lines) + "\n"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+metrics = Metrics()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("statement_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["statement_start"].pop()
+    metrics.observe_statement(statement, seconds)
+    request_sql = _request_sql.get()
+    if request_sql is not None:
+        request_sql[0] += seconds
+
+# Time every statement an engine runs, an async engine is instrumented through its sync_engine
+def instrument_engine(engine: Engine) -> None:
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+# ASGI middleware recording the latency of every request under its route template, e.g. /applicant/{netid}
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = [500]
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+        request_sql = [0.0]
+        token = _request_sql.set(request_sql)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - start
+            _request_sql.reset(token)
+            route = scope.get("route")
+            metrics.observe_request(scope["method"], route.path if route else "unmatched", status[0], seconds, request_sql[0])
+
+# Add the middleware and GET /metrics to an app and time the statements of its engine
+def instrument_app(app, engine: Engine) -> None:
+    from fastapi.responses import PlainTextResponse
+
+    instrument_engine(engine)
+    app.add_middleware(MetricsMiddleware)
+
+    def prometheus_metrics():
+        return PlainTextResponse(metrics.to_prometheus(), media_type="text/plain; version=0.0.4")
+    app.add_api_route("/metrics", prometheus_metrics, methods=["GET"], include_in_schema=False)
+
+# Profile a CLI command: cProfile and SQL timings run until the returned function is called,
+# which writes <prefix>.pstats and <prefix>.json and prints the slowest functions
+def profile_command(prefix: str) -> Callable[[], None]:
+    from .database import engine
+
+    instrument_engine(engine)
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+
+    def stop() -> None:
+        profiler.disable()
+        seconds = time.perf_counter() - start
+        profiler.dump_stats(prefix + ".pstats")
+        report = {"seconds": seconds, **metrics.to_dict(), "profile": prefix + ".pstats"}
+        with open(prefix + ".json", "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Ran in {seconds:.3f}s, {report['sql']['seconds']:.3f}s of it in {report['sql']['statements']} SQL statements")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+        print("Wrote", prefix + ".pstats", "and", prefix + ".json")
+    return stop
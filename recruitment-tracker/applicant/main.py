@@ -1,13 +1,17 @@
-from typing import final, List
-from fastapi import FastAPI, Depends, Response, HTTPException, status
-from . import schemas, models, database
+from typing import final, List, Optional
+from fastapi import FastAPI, Depends, Query, Response, HTTPException, status
+from . import schemas, models, database, migrations, queries, batch, cache, review, search, summary, instrumentation
 from .database import engine, SessionLocal
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 app = FastAPI()
 
-# Create the tables if they don't exist
-models.Base.metadata.create_all(engine)
+# Create the tables if they don't exist and bring older DBs up to date
+migrations.upgrade(engine)
+
+# TRACKER_METRICS=1 times SQL statements and requests, served on GET /metrics
+if instrumentation.METRICS_ENABLED:
+    instrumentation.instrument_app(app, engine)
 
 def get_db():
     db = SessionLocal()
@@ -41,8 +45,36 @@ def create(request: schemas.Applicant, db: Session = Depends(get_db)):
         )
     db.add(new_applicant)
     db.commit()
-    db.refresh(new_applicant)
-    return new_applicant
+    cache.applicant_cache.invalidate(request.netid)
+    # Reload with the task joined in rather than refreshing and then lazy loading it
+    return db.query(models.Applicant).options(joinedload(models.Applicant.task)).filter(models.Applicant.netid == request.netid).one()
+
+# Create many applicants at once, validated with set-based queries and inserted in one transaction
+@app.post('/applicants:batch', response_model=schemas.BatchResult, status_code=status.HTTP_201_CREATED, tags=['applicants'])
+def create_batch(request: schemas.ApplicantBatch, db: Session = Depends(get_db)):
+    result = batch.create_applicants(db, request)
+    cache.applicant_cache.invalidate(*[item.netid for item in request.items])
+    if request.atomic and result.failed:
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=result.dict())
+    return result
+
+# Update many applicants at once, each item like a PATCH body with the netid it changes
+@app.patch('/applicants:batch', response_model=schemas.BatchResult, tags=['applicants'])
+def update_batch(request: schemas.ApplicantBatchUpdate, db: Session = Depends(get_db)):
+    result = batch.update_applicants(db, request)
+    cache.applicant_cache.invalidate(*[item.netid for item in request.items])
+    if request.atomic and result.failed:
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=result.dict())
+    return result
+
+# Delete many applicants at once
+@app.post('/applicants:delete', response_model=schemas.BatchResult, tags=['applicants'])
+def delete_batch(request: schemas.ApplicantBatchDelete, db: Session = Depends(get_db)):
+    result = batch.delete_applicants(db, request)
+    cache.applicant_cache.invalidate(*request.netids)
+    if request.atomic and result.failed:
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=result.dict())
+    return result
 
 # Delete an applicant by their netid
 @app.delete('/applicant/{netid}',tags=['applicants'])
@@ -52,6 +84,7 @@ def delete(netid: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Applicant with netid '{netid}' not found")
     applicant.delete(synchronize_session=False)
     db.commit()
+    cache.applicant_cache.invalidate(netid)
     return 'deleted'
 
 # Update an applicant by their netid
@@ -66,20 +99,51 @@ def update(netid: str, request: schemas.Applicant, db: Session = Depends(get_db)
     check_netid = db.query(models.Applicant).filter(models.Applicant.netid == request.netid).first()
     if (check_netid):
         raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=f"Applicant with netid "+request.netid+" already exists")
-    applicant.update(request.dict())
+    applicant.update({**request.dict(), models.Applicant.version: models.Applicant.version + 1})
     db.commit()
+    cache.applicant_cache.invalidate(netid, request.netid)
     return 'updated'
 
-# Show all applicants
-@app.get('/applicant',tags=['applicants'])
-def all(db: Session = Depends(get_db)):
-    applicants = db.query(models.Applicant).order_by(models.Applicant.netid).all()
-    return applicants
+# Update only the fields sent, 409 if the applicant changed since `version` was read
+@app.patch('/applicant/{netid}', response_model=schemas.ApplicantVersion, tags=['applicants'])
+def patch(netid: str, request: schemas.ApplicantPatch, db: Session = Depends(get_db)):
+    try:
+        result = review.patch_applicant(db, netid, request)
+    except review.NotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Applicant with netid '{netid}' does not exist")
+    except review.UnknownTask as e:
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=str(e))
+    except review.VersionConflict as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail={"message": str(e), "version": e.current})
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    cache.applicant_cache.invalidate(netid)
+    return result
+
+# Select (or with "selected": false unselect) many applicants in one UPDATE
+@app.post('/applicants:select', response_model=schemas.BulkResult, tags=['applicants'])
+def select_applicants(request: schemas.SelectApplicants, db: Session = Depends(get_db)):
+    result = review.select_applicants(db, request)
+    cache.applicant_cache.invalidate(*request.netids)
+    return result
+
+# Show applicants a page at a time, ordered by netid
+# Pass the returned next_after back as ?after= to get the next page
+@app.get('/applicant', response_model=schemas.ApplicantPage, tags=['applicants'])
+def all(limit: int = Query(queries.DEFAULT_PAGE_SIZE, ge=1, le=queries.MAX_PAGE_SIZE), after: Optional[str] = None,
+        fields: Optional[str] = None, team: Optional[str] = None, year: Optional[str] = None,
+        selected: Optional[bool] = None, db: Session = Depends(get_db)):
+    try:
+        columns = queries.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    rows = db.execute(queries.applicant_page_query(columns, limit, after, team, year, selected)).all()
+    return queries.applicant_page(columns, rows, limit)
 
 # Search an applicant by their netid
 @app.get('/applicant/{netid}', response_model=schemas.ShowApplicant, status_code=status.HTTP_202_ACCEPTED, tags=['applicants'])
 def get_by_netid(netid: str, response: Response, db: Session = Depends(get_db)):
-    applicant = db.query(models.Applicant).filter(models.Applicant.netid == netid).first()
+    applicant = cache.get_applicant(db, netid)
     if not applicant:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Applicant with netid '{netid}' not found")
     return applicant
@@ -100,15 +164,44 @@ def create_assignment(request: schemas.AdditionalInfo, db: Session = Depends(get
     )
         db.add(new_assignment)
         db.commit()
+        cache.invalidate_task(request.id)
         db.refresh(new_assignment)
         return new_assignment
     else:
         raise HTTPException(status_code=status.HTTP_405_METHOD_NOT_ALLOWED, detail=f"Assignment with this id already exists")
 
+# Create many assignments at once, validated with set-based queries and inserted in one transaction
+@app.post('/assignments:batch', response_model=schemas.BatchResult, status_code=status.HTTP_201_CREATED, tags=['assignments'])
+def create_assignment_batch(request: schemas.AssignmentBatch, db: Session = Depends(get_db)):
+    result = batch.create_assignments(db, request)
+    for item in request.items:
+        cache.invalidate_task(item.id)
+    if request.atomic and result.failed:
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=result.dict())
+    return result
+
+# Update many assignments at once, each item like a PATCH body with the id it changes
+@app.patch('/assignments:batch', response_model=schemas.BatchResult, tags=['assignments'])
+def update_assignment_batch(request: schemas.AssignmentBatchUpdate, db: Session = Depends(get_db)):
+    result = batch.update_assignments(db, request)
+    cache.invalidate_tasks(item.id for item in request.items)
+    if request.atomic and result.failed:
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=result.dict())
+    return result
+
+# Delete many assignments at once, those still given to an applicant are refused
+@app.post('/assignments:delete', response_model=schemas.BatchResult, tags=['assignments'])
+def delete_assignment_batch(request: schemas.AssignmentBatchDelete, db: Session = Depends(get_db)):
+    result = batch.delete_assignments(db, request)
+    cache.invalidate_tasks(request.ids)
+    if request.atomic and result.failed:
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=result.dict())
+    return result
+
 # Get everyone doing an assignment by task id
 @app.get('/assignment/{id}', response_model= schemas.ShowAdditionalInfo, status_code=status.HTTP_202_ACCEPTED ,tags=['assignments'])
 def get_assignment_by_id(id: int, db: Session = Depends(get_db)):
-    assignment = db.query(models.AdditionalInfo).filter(models.AdditionalInfo.id == id).first()
+    assignment = db.query(models.AdditionalInfo).options(selectinload(models.AdditionalInfo.person)).filter(models.AdditionalInfo.id == id).first()
     if not assignment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Assignment with the id '{id}' is not available")
     return assignment
@@ -116,18 +209,59 @@ def get_assignment_by_id(id: int, db: Session = Depends(get_db)):
 # Get an assignment by assignment no
 @app.get('/assignments/{no}', response_model=List[schemas.ShowAdditionalInfo],status_code=status.HTTP_202_ACCEPTED, tags=['assignments'])
 def get_by_assignment_number(no: str, db: Session = Depends(get_db)):
-    assignments = db.query(models.AdditionalInfo).filter(models.AdditionalInfo.assignment_no == no)
-    #print(assignments.first().person)
-    if len(assignments.all()) == 0:
+    # Everyone doing these assignments is fetched in one extra query instead of one per assignment
+    assignments = db.query(models.AdditionalInfo).options(selectinload(models.AdditionalInfo.person)).filter(models.AdditionalInfo.assignment_no == no).all()
+    if len(assignments) == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Assignment with the assignment number '{no}' does not exist")
-    result = [u for u in assignments.all()]
-    return result
+    return assignments
      
 # Update a task by task id
 @app.put('/assignment/{id}', status_code=status.HTTP_202_ACCEPTED, tags=['assignments'])
-def update(id: str, request: schemas.UpdateAdditionalInfo, db: Session = Depends(get_db)):
-    applicant = db.query(models.AdditionalInfo).filter(models.AdditionalInfo.id == id)
-    if not applicant.first():
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Applicant with netid '{id}' does not exist")
+def update_assignment(id: int, request: schemas.UpdateAdditionalInfo, db: Session = Depends(get_db)):
+    updated = db.query(models.AdditionalInfo).filter(models.AdditionalInfo.id == id).update(
+        {**request.dict(), models.AdditionalInfo.version: models.AdditionalInfo.version + 1}, synchronize_session=False
+    )
+    if not updated:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Assignment with the id '{id}' does not exist")
     db.commit()
-    return 'updated'
\ No newline at end of file
+    cache.invalidate_task(id)
+    return 'updated'
+
+# Update only the fields sent, 409 if the assignment changed since `version` was read
+@app.patch('/assignment/{id}', response_model=schemas.AssignmentVersion, tags=['assignments'])
+def patch_assignment(id: int, request: schemas.AssignmentPatch, db: Session = Depends(get_db)):
+    try:
+        result = review.patch_assignment(db, id, request)
+    except review.NotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Assignment with the id '{id}' does not exist")
+    except review.VersionConflict as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail={"message": str(e), "version": e.current})
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    cache.invalidate_task(id)
+    return result
+
+# Mark many assignments submitted (or with "submitted": false not submitted) in one UPDATE
+@app.post('/assignments:submit', response_model=schemas.BulkResult, tags=['assignments'])
+def submit_assignments(request: schemas.SubmitAssignments, db: Session = Depends(get_db)):
+    result = review.submit_assignments(db, request)
+    cache.invalidate_tasks(request.ids)
+    return result
+
+# Full-text search over names, majors, minors, teams and essay answers, best matches first
+@app.get('/search', response_model=List[schemas.SearchResult], tags=['applicants'])
+def search_applicants(q: str, limit: int = Query(search.DEFAULT_LIMIT, ge=1, le=search.MAX_LIMIT), db: Session = Depends(get_db)):
+    try:
+        return search.search(db, q, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+# Submitted, not submitted and overdue counts overall and per team, read from the summary table
+@app.get('/overview', response_model=schemas.OverviewSummary, tags=['overview'])
+def overview(db: Session = Depends(get_db)):
+    return summary.overview_summary(db)
+
+# Hit/miss/eviction counters of the netid lookup cache
+@app.get('/cache/stats', tags=['cache'])
+def cache_stats():
+    return cache.applicant_cache.stats()
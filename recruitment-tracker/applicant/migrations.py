@@ -0,0 +1,69 @@
+#*********************************************************************************#
+# This file brings existing applicant.db files up to date with the current models #
+#*********************************************************************************#
+from sqlalchemy.engine import Engine
+
+from . import models, search, summary
+
+# Version 1: applicants.row_hash, used by init --incremental
+def _add_row_hash(conn) -> None:
+    columns = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(applicants)")]
+    if "row_hash" not in columns:
+        conn.exec_driver_sql("ALTER TABLE applicants ADD COLUMN row_hash VARCHAR")
+
+# Version 2: indexes on the columns the overview and assignment lookups filter on
+def _add_filter_indexes(conn) -> None:
+    for table in (models.AdditionalInfo.__table__, models.Applicant.__table__):
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+# Version 3: essay columns and the full-text index over applicants
+def _add_full_text_search(conn) -> None:
+    columns = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(applicants)")]
+    for column in ("team_interest", "value_add", "hopes"):
+        if column not in columns:
+            conn.exec_driver_sql(f"ALTER TABLE applicants ADD COLUMN {column} VARCHAR DEFAULT ''")
+    search.create_index(conn)
+    search.rebuild(conn)
+    # Essays were never stored before, forgetting the file digests makes the next init --incremental read them in
+    conn.execute(models.SourceFile.__table__.delete())
+
+# Version 4: the overview summary table and the triggers keeping it up to date
+def _add_overview_summary(conn) -> None:
+    summary.create_triggers(conn)
+    summary.rebuild(conn)
+
+# Version 5: row versions for the PATCH endpoints, and a full-text trigger that ignores reviewer-only updates
+def _add_versions(conn) -> None:
+    for table in ("applicants", "assignments"):
+        columns = [row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")]
+        if "version" not in columns:
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+    conn.exec_driver_sql("DROP TRIGGER IF EXISTS applicant_search_update")
+    search.create_index(conn)
+
+# (schema version, step) pairs, a DB at version N only runs the steps listed after N
+MIGRATIONS = (
+    (1, _add_row_hash),
+    (2, _add_filter_indexes),
+    (3, _add_full_text_search),
+    (4, _add_overview_summary),
+    (5, _add_versions),
+)
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Schema version stored in the SQLite header, 0 for DBs that predate migrations
+def schema_version(conn) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+# Create missing tables and run every migration newer than the DB's schema version
+def upgrade(engine: Engine) -> None:
+    models.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        version = schema_version(conn)
+        if version >= SCHEMA_VERSION:
+            return
+        for target, migrate in MIGRATIONS:
+            if version < target:
+                migrate(conn)
+        conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, Integer, Date, ForeignKey
+from sqlalchemy import Column, String, Boolean, Integer, Date, ForeignKey, Index
 from sqlalchemy.sql.schema import ForeignKey
 from .database import Base
 import datetime
@@ -17,18 +17,49 @@ class Applicant(Base):
     teams = Column(String)
     minor = Column(String, default="", nullable=True)
     sminor = Column(String, default="", nullable=True)
-    task_id = Column(Integer, ForeignKey('assignments.id'))
+    task_id = Column(Integer, ForeignKey('assignments.id'), index=True)
+    row_hash = Column(String, nullable=True) # Hash of the CSV row this applicant was ingested from
+    # Essay answers from the submission form, indexed for full-text search
+    team_interest = Column(String, default="", nullable=True)
+    value_add = Column(String, default="", nullable=True)
+    hopes = Column(String, default="", nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1") # Bumped on every write, PATCH checks it
     #Relationship b/w tables
     task = relationship("AdditionalInfo", back_populates="person")
 
 class AdditionalInfo(Base):
     __tablename__ = "assignments"
     id = Column(Integer, primary_key=True, index=True)
-    assignment_no = Column(String)
+    assignment_no = Column(String, index=True)
     team_assigned = Column(String)
     date_given = Column(Date)
-    date_due = Column(Date)
+    date_due = Column(Date, index=True)
     submitted = Column(Boolean, default=False)
     assignment_comments = Column(String, default="NA", nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1") # Bumped on every write, PATCH checks it
     #Relationship b/w tables
-    person = relationship("Applicant", back_populates="task")
\ No newline at end of file
+    person = relationship("Applicant", back_populates="task")
+    # Overview filters on submitted and then date_due
+    __table_args__ = (Index("ix_assignments_submitted_date_due", "submitted", "date_due"),)
+
+class SourceFile(Base):
+    __tablename__ = "source_files"
+    kind = Column(String, primary_key=True) # "assignment" or "submission"
+    digest = Column(String) # Content hash of the CSV file last ingested
+    rows = Column(Integer) # Rows ingested from that pair of files
+
+# Applicants per assignment team, status and due date, kept up to date by the triggers in summary.py
+class OverviewSummary(Base):
+    __tablename__ = "overview_summary"
+    team_assigned = Column(String, primary_key=True)
+    submitted = Column(Boolean, primary_key=True)
+    date_due = Column(Date, primary_key=True, index=True) # Overdue counts are a range scan on this index
+    applicants = Column(Integer, nullable=False)
+    # The next due date is the first not-submitted entry on or after today
+    __table_args__ = (Index("ix_overview_summary_submitted_date_due", "submitted", "date_due"),)
+
+# A counter every init bumps, the applicant caches of all processes compare it on each lookup
+class IngestGeneration(Base):
+    __tablename__ = "ingest_generation"
+    id = Column(Integer, primary_key=True) # Always 1, the table holds a single row
+    generation = Column(Integer, nullable=False)
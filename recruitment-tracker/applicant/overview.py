@@ -0,0 +1,182 @@
+#*********************************************************************************#
+# This file builds the applicant overview from a single joined query              #
+#*********************************************************************************#
+import csv
+import json
+from datetime import date
+from typing import Dict, Iterable, Iterator, Optional
+
+from sqlalchemy import and_, case, func, literal, or_, select, union_all
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Overview sections, rows come back from the query in this order
+NOT_SUBMITTED = 0
+SUBMITTED = 1
+OVERDUE = 2
+SECTIONS = (NOT_SUBMITTED, SUBMITTED, OVERDUE)
+
+# Names of the sections in exported files
+SECTION_NAMES = {NOT_SUBMITTED: "not_submitted", SUBMITTED: "submitted", OVERDUE: "overdue"}
+
+# Columns of an exported overview row
+EXPORT_COLUMNS = ("section", "netid", "name", "assignment_no", "date_given", "date_due", "assignment_comments")
+
+# Rows fetched from the DB at a time while streaming
+DEFAULT_YIELD_PER = 1000
+
+# Output buffer used when exporting
+WRITE_BUFFER_SIZE = 1 << 20
+
+# One statement for the whole overview: every applicant/assignment pair is joined against the
+# sections it belongs to, and the per-section counts ride along on each row as window aggregates
+def overview_query(today: Optional[date] = None):
+    today = today or date.today()
+    assignment = models.AdditionalInfo
+    applicant = models.Applicant
+    sections = union_all(*[select(literal(section).label("section")) for section in SECTIONS]).subquery("sections")
+    section = sections.c.section
+    in_section = or_(
+        and_(section == NOT_SUBMITTED, assignment.submitted == False),
+        and_(section == SUBMITTED, assignment.submitted == True),
+        and_(section == OVERDUE, assignment.date_due < today),
+    )
+    counts = [func.sum(case((section == s, 1), else_=0)).over().label(f"count_{s}") for s in SECTIONS]
+    return (
+        select(
+            section,
+            applicant.netid,
+            applicant.name,
+            assignment.assignment_no,
+            assignment.date_given,
+            assignment.date_due,
+            assignment.assignment_comments,
+            *counts,
+        )
+        .select_from(assignment)
+        .join(applicant, applicant.task_id == assignment.id)
+        .join(sections, in_section)
+        .order_by(section, assignment.id, applicant.netid)
+    )
+
+# Stream the overview rows without loading the whole result into memory
+def stream_overview(db: Session, today: Optional[date] = None, yield_per: int = DEFAULT_YIELD_PER) -> Iterator:
+    return iter(db.execute(overview_query(today).execution_options(yield_per=yield_per)))
+
+# Per-section counts, they are the same on every row of the result
+def overview_counts(row) -> Dict[int, int]:
+    if row is None:
+        return {s: 0 for s in SECTIONS}
+    return {s: getattr(row, f"count_{s}") for s in SECTIONS}
+
+# (count line, heading, column header, whether the comments column is shown) of every section
+SECTION_TEXT = {
+    NOT_SUBMITTED: (
+        "Total Number of Applicants That Haven't Done with Their Assignment: ",
+        "Applicants Who Haven't Submitted Assignments:-",
+        "| NetID | Name | Assignment Number | Date Given | Date Due |",
+        False,
+    ),
+    SUBMITTED: (
+        "Total Number of Applicants That Have Done Their Assignments: ",
+        "Applicants Who Have Submitted Assignments:-",
+        "| NetID | Name | Assignment Number | Date Given | Date Due | Comments |",
+        True,
+    ),
+    OVERDUE: (
+        "Applicants overdue on Assignments: ",
+        "Applicants Who Are Overdue:-",
+        "| NetID | Name | Assignment Number | Date Given | Date Due | Comments |",
+        True,
+    ),
+}
+
+# Render streamed overview rows as the lines shown in the terminal and written to output.txt
+def render_overview(rows: Iterable) -> Iterator[str]:
+    rows = iter(rows)
+    row = next(rows, None)
+    counts = overview_counts(row)
+    # Every assignment is either submitted or not, so those two sections cover all applicants
+    yield f"Total Number of Applicants Given an Assignment: {counts[NOT_SUBMITTED] + counts[SUBMITTED]}"
+    for section in SECTIONS:
+        count_line, heading, header, with_comments = SECTION_TEXT[section]
+        yield f"{count_line}{counts[section]}"
+        if counts[section] > 0:
+            yield heading
+            yield header
+        while row is not None and row.section == section:
+            values = [row.netid, row.name, row.assignment_no, row.date_given, row.date_due]
+            if with_comments:
+                values.append(row.assignment_comments)
+            yield _line(*values)
+            row = next(rows, None)
+
+def _line(*values) -> str:
+    return " ".join(["|", *map(str, values), "|"])
+
+# Positional access, looking columns up by name on every row is measurably slower
+def _export_values(row) -> list:
+    return [SECTION_NAMES[row[0]], *row[1:7]]
+
+def _write_text(rows: Iterable, file) -> None:
+    for line in render_overview(rows):
+        file.write(line)
+        file.write("\n")
+
+def _write_csv(rows: Iterable, file) -> None:
+    writer = csv.writer(file)
+    writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(map(_export_values, rows))
+
+def _write_jsonl(rows: Iterable, file) -> None:
+    encode = json.JSONEncoder(default=str).encode
+    for row in rows:
+        file.write(encode(dict(zip(EXPORT_COLUMNS, _export_values(row)))))
+        file.write("\n")
+
+def _write_markdown(rows: Iterable, file) -> None:
+    rows = iter(rows)
+    row = next(rows, None)
+    counts = overview_counts(row)
+    file.write("# Applicant Overview\n\n")
+    file.write(f"- Applicants given an assignment: {counts[NOT_SUBMITTED] + counts[SUBMITTED]}\n")
+    for section in SECTIONS:
+        file.write(f"- {SECTION_NAMES[section]}: {counts[section]}\n")
+    while row is not None:
+        section = row.section
+        file.write(f"\n## {SECTION_NAMES[section]}\n\n")
+        file.write("| NetID | Name | Assignment Number | Date Given | Date Due | Comments |\n")
+        file.write("| --- | --- | --- | --- | --- | --- |\n")
+        while row is not None and row.section == section:
+            cells = (str(value).replace("|", "\\|") for value in _export_values(row)[1:])
+            file.write("| " + " | ".join(cells) + " |\n")
+            row = next(rows, None)
+
+# Writers for every export format
+FORMATS = {
+    "csv": _write_csv,
+    "jsonl": _write_jsonl,
+    "md": _write_markdown,
+    "txt": _write_text,
+}
+
+# Stream the overview straight from the DB cursor into a buffered file, returning the rows written
+def export_overview(db: Session, path, output_format: str = "md", today: Optional[date] = None) -> int:
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown format '{output_format}', expected one of: {', '.join(FORMATS)}")
+    return write_overview(stream_overview(db, today), path, output_format)
+
+# Write overview rows, from the DB or a snapshot, into a buffered file in one of FORMATS
+def write_overview(rows: Iterable, path, output_format: str = "md") -> int:
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown format '{output_format}', expected one of: {', '.join(FORMATS)}")
+    written = 0
+    def counted(rows):
+        nonlocal written
+        for row in rows:
+            written += 1
+            yield row
+    with open(path, "w", newline="", buffering=WRITE_BUFFER_SIZE) as file:
+        FORMATS[output_format](counted(rows), file)
+    return written
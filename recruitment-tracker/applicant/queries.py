@@ -0,0 +1,64 @@
+#*********************************************************************************#
+# This file contains the query builders shared by the sync and async APIs         #
+#*********************************************************************************#
+from typing import List, Optional
+
+from sqlalchemy import select
+
+from . import models
+
+# Essay answers, only served by GET /search
+ESSAY_FIELDS = ("team_interest", "value_add", "hopes")
+
+# Columns a client may ask for through ?fields=, row_hash is internal to ingest
+APPLICANT_FIELDS = tuple(
+    column.name for column in models.Applicant.__table__.columns if column.name != "row_hash" and column.name not in ESSAY_FIELDS
+)
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Turn ?fields=name,email into the columns to select, netid is always included since it is the cursor
+def parse_fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return list(APPLICANT_FIELDS)
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in APPLICANT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return ["netid"] + [field for field in dict.fromkeys(requested) if field != "netid"]
+
+# One page of applicants ordered by netid, starting after the `after` cursor
+# One extra row is fetched so the caller can tell whether there is a next page
+def applicant_page_query(columns: List[str], limit: int, after: Optional[str] = None, team: Optional[str] = None,
+                         year: Optional[str] = None, selected: Optional[bool] = None):
+    table = models.Applicant.__table__
+    query = select(*[table.c[column] for column in columns]).order_by(table.c.netid).limit(limit + 1)
+    if after is not None:
+        query = query.where(table.c.netid > after)
+    if team is not None:
+        # Applicants can list several teams, e.g. "Software Development, Quantitative Research"
+        query = query.where(table.c.teams.contains(team, autoescape=True))
+    if year is not None:
+        query = query.where(table.c.year == year)
+    if selected is not None:
+        query = query.where(table.c.selected == selected)
+    return query
+
+# Build the response body from the rows of applicant_page_query
+def applicant_page(columns: List[str], rows, limit: int) -> dict:
+    items = [dict(zip(columns, row)) for row in rows[:limit]]
+    next_after = items[-1]["netid"] if len(rows) > limit else None
+    return {"items": items, "next_after": next_after}
+
+# Applicants assigned to a team with their assignment, in netid order, the same columns as snapshot.ROSTER_FIELDS
+def roster_query(team: str):
+    applicant = models.Applicant.__table__
+    assignment = models.AdditionalInfo.__table__
+    return (
+        select(applicant.c.netid, applicant.c.name, applicant.c.email, applicant.c.year, applicant.c.major,
+               assignment.c.assignment_no, assignment.c.date_due, assignment.c.submitted, applicant.c.selected)
+        .select_from(applicant.join(assignment, assignment.c.id == applicant.c.task_id))
+        .where(assignment.c.team_assigned == team)
+        .order_by(applicant.c.netid)
+    )
@@ -0,0 +1,78 @@
+#*********************************************************************************#
+# This file contains the review workflow behind the PATCH endpoints and the bulk  #
+# select/submit operations, shared by the sync and async APIs                     #
+#*********************************************************************************#
+import json
+from typing import List
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+
+class NotFound(LookupError):
+    pass
+
+class UnknownTask(ValueError):
+    pass
+
+# The row was changed by someone else since the client read it
+class VersionConflict(Exception):
+    def __init__(self, current: int):
+        super().__init__(f"Version {current} is current, reload and apply your changes again")
+        self.current = current
+
+# Update only the fields that were sent, as one UPDATE guarded by the version the client read.
+# The version goes up by one on every write, returns the new one
+def _patch(db: Session, model, key_column, key, values: dict, expected: int) -> int:
+    if not values:
+        raise ValueError("Nothing to update")
+    result = db.execute(
+        update(model)
+        .where(key_column == key, model.version == expected)
+        .values(**values, version=model.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        # Only a failed update pays for finding out why
+        current = db.execute(select(model.version).where(key_column == key)).scalar()
+        db.rollback()
+        if current is None:
+            raise NotFound(key)
+        raise VersionConflict(current)
+    db.commit()
+    return expected + 1
+
+def patch_applicant(db: Session, netid: str, request: schemas.ApplicantPatch) -> schemas.ApplicantVersion:
+    values = request.dict(exclude_unset=True, exclude={"version"})
+    if "task_id" in values and not db.get(models.AdditionalInfo, values["task_id"]):
+        raise UnknownTask(f"Task ID {values['task_id']} does not exist")
+    version = _patch(db, models.Applicant, models.Applicant.netid, netid, values, request.version)
+    return schemas.ApplicantVersion(netid=netid, version=version)
+
+def patch_assignment(db: Session, id: int, request: schemas.AssignmentPatch) -> schemas.AssignmentVersion:
+    values = request.dict(exclude_unset=True, exclude={"version"})
+    version = _patch(db, models.AdditionalInfo, models.AdditionalInfo.id, id, values, request.version)
+    return schemas.AssignmentVersion(id=id, version=version)
+
+# Set one flag on many rows in a single UPDATE. The keys travel as one JSON parameter read back
+# through json_each, so there is no bound parameter limit, and rows already set are left alone
+# so their version only changes when they do
+def _mark(db: Session, model, key_column, keys: List, flag, value: bool) -> int:
+    if not keys:
+        return 0
+    key_values = func.json_each(json.dumps(keys)).table_valued("value")
+    result = db.execute(
+        update(model)
+        .where(key_column.in_(select(key_values.c.value)), flag.is_not(value))
+        .values({flag: value, model.version: model.version + 1})
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+def select_applicants(db: Session, request: schemas.SelectApplicants) -> schemas.BulkResult:
+    return schemas.BulkResult(updated=_mark(db, models.Applicant, models.Applicant.netid, request.netids, models.Applicant.selected, request.selected))
+
+def submit_assignments(db: Session, request: schemas.SubmitAssignments) -> schemas.BulkResult:
+    return schemas.BulkResult(updated=_mark(db, models.AdditionalInfo, models.AdditionalInfo.id, request.ids, models.AdditionalInfo.submitted, request.submitted))
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, root_validator
+from typing import Any, Dict, Optional, List
 
 from sqlalchemy.sql.sqltypes import DateTime
 import datetime
@@ -43,6 +43,84 @@ class UpdateAdditionalInfo(BaseModel):
 
     class Config():
         orm_mode = True
+
+# Fields sent as null would be written as NULL, which the Show schemas and the overview can't take,
+# so a PATCH may only clear the fields listed in `nullable`
+def _reject_nulls(nullable):
+    def check(cls, values):
+        cleared = [field for field, value in values.items() if value is None and field in cls.__fields__ and field not in nullable]
+        if cleared:
+            raise ValueError(f"{', '.join(cleared)} can't be null")
+        return values
+    return root_validator(pre=True, allow_reuse=True)(check)
+
+# PATCH bodies: only the fields that are sent get updated, `version` is the one the client last read
+class ApplicantPatch(BaseModel):
+    _check_nulls = _reject_nulls({"comments", "smajor", "minor", "sminor"})
+    version: int
+    selected: Optional[bool]
+    comments: Optional[str]
+    name: Optional[str]
+    email: Optional[str]
+    year: Optional[str]
+    major: Optional[str]
+    smajor: Optional[str]
+    teams: Optional[str]
+    minor: Optional[str]
+    sminor: Optional[str]
+    task_id: Optional[int]
+
+class AssignmentPatch(BaseModel):
+    _check_nulls = _reject_nulls({"assignment_comments"})
+    version: int
+    assignment_no: Optional[str]
+    team_assigned: Optional[str]
+    date_given: Optional[datetime.date]
+    date_due: Optional[datetime.date]
+    submitted: Optional[bool]
+    assignment_comments: Optional[str]
+
+# Bulk review requests, applied in a single UPDATE
+class SelectApplicants(BaseModel):
+    netids: List[str]
+    selected: bool = True
+
+class SubmitAssignments(BaseModel):
+    ids: List[int]
+    submitted: bool = True
+
+# Batch create requests, with atomic=True nothing is inserted unless every item is valid
+class ApplicantBatch(BaseModel):
+    items: List[Applicant]
+    atomic: bool = False
+
+class AssignmentBatch(BaseModel):
+    items: List[AdditionalInfo]
+    atomic: bool = False
+
+# Batch update items are PATCH bodies naming the row they change
+class ApplicantBatchPatch(ApplicantPatch):
+    netid: str
+
+class AssignmentBatchPatch(AssignmentPatch):
+    id: int
+
+class ApplicantBatchUpdate(BaseModel):
+    items: List[ApplicantBatchPatch]
+    atomic: bool = False
+
+class AssignmentBatchUpdate(BaseModel):
+    items: List[AssignmentBatchPatch]
+    atomic: bool = False
+
+class ApplicantBatchDelete(BaseModel):
+    netids: List[str]
+    atomic: bool = False
+
+class AssignmentBatchDelete(BaseModel):
+    ids: List[int]
+    atomic: bool = False
+
 # Response Models:
 
 class ShowApplicant(BaseModel):
@@ -58,6 +136,7 @@ class ShowApplicant(BaseModel):
     minor: Optional[str] = ""
     sminor: Optional[str] = ""
     task_id: int
+    version: int = 1
     task: AdditionalInfo
 
     class Config():
@@ -71,7 +150,76 @@ class ShowAdditionalInfo(BaseModel):
     date_due: datetime.date
     submitted: bool = False
     assignment_comments: Optional[str] = "NA"  
+    version: int = 1
     person: List[Applicant] = []
 
     class Config():
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+# Version of a row after a PATCH, send it with the next one
+class ApplicantVersion(BaseModel):
+    netid: str
+    version: int
+
+class AssignmentVersion(BaseModel):
+    id: int
+    version: int
+
+# Rows a bulk select/submit changed, rows that already had the value are not counted
+class BulkResult(BaseModel):
+    updated: int
+
+# One page of GET /applicant, items only hold the requested columns
+class ApplicantPage(BaseModel):
+    items: List[Dict[str, Any]]
+    next_after: Optional[str] = None
+
+# Outcome of one item of a batch request, status is "created", "error" or "skipped"
+class BatchItemResult(BaseModel):
+    index: int
+    key: str
+    status: str
+    detail: Optional[str] = None
+
+# Only the count of the operation that was asked for is set
+class BatchResult(BaseModel):
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+    failed: int
+    results: List[BatchItemResult]
+
+# One hit of GET /search, snippet shows the matched words in [brackets]
+class SearchResult(BaseModel):
+    netid: str
+    name: str
+    major: Optional[str] = None
+    teams: Optional[str] = None
+    rank: float
+    snippet: str
+
+# Applicant counts of the overview sections
+class SectionCounts(BaseModel):
+    not_submitted: int = 0
+    submitted: int = 0
+    overdue: int = 0
+
+# GET /overview, read from the precomputed summary table
+class OverviewSummary(BaseModel):
+    today: datetime.date
+    given: int
+    totals: SectionCounts
+    teams: Dict[str, SectionCounts]
+    next_due: Optional[datetime.date] = None
+
+# One applicant of GET /roster/{team} on the read-only API
+class RosterEntry(BaseModel):
+    netid: str
+    name: Optional[str] = None
+    email: Optional[str] = None
+    year: Optional[str] = None
+    major: Optional[str] = None
+    assignment_no: Optional[str] = None
+    date_due: Optional[datetime.date] = None
+    submitted: Optional[bool] = None
+    selected: Optional[bool] = None
@@ -0,0 +1,82 @@
+#*********************************************************************************#
+# This file contains the full-text search over applicants and their essays,       #
+# an SQLite FTS5 index kept in sync with the applicants table by triggers          #
+#*********************************************************************************#
+import re
+from typing import List
+
+from sqlalchemy import DDL, event, text
+
+from . import models
+
+# Columns of the applicants table that are indexed, netid is stored so results can be matched up but not searched
+SEARCH_COLUMNS = ("netid", "name", "major", "smajor", "minor", "sminor", "teams", "team_interest", "value_add", "hopes")
+
+# bm25 weight of every column above, a hit on a name counts for more than a hit in an essay
+SEARCH_WEIGHTS = (0, 10, 3, 3, 3, 3, 2, 1, 1, 1)
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# Words shown around the matches in a snippet
+SNIPPET_TOKENS = 12
+
+_columns = ", ".join(SEARCH_COLUMNS)
+_new = ", ".join("new." + column for column in SEARCH_COLUMNS)
+_old = ", ".join("old." + column for column in SEARCH_COLUMNS)
+
+# External content table: the text lives in applicants only, the index points back at it by rowid.
+# applicants has no INTEGER PRIMARY KEY so a VACUUM may renumber its rowids, call rebuild() after one
+CREATE_STATEMENTS = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS applicant_search USING fts5("
+    f"{', '.join(c + ' UNINDEXED' if c == 'netid' else c for c in SEARCH_COLUMNS)}, "
+    f"content='applicants', tokenize='porter unicode61')",
+    f"CREATE TRIGGER IF NOT EXISTS applicant_search_insert AFTER INSERT ON applicants BEGIN "
+    f"INSERT INTO applicant_search(rowid, {_columns}) VALUES (new.rowid, {_new}); END",
+    f"CREATE TRIGGER IF NOT EXISTS applicant_search_delete AFTER DELETE ON applicants BEGIN "
+    f"INSERT INTO applicant_search(applicant_search, rowid, {_columns}) VALUES ('delete', old.rowid, {_old}); END",
+    # Only changes to indexed columns touch the index, so marking applicants selected never rewrites their essays
+    f"CREATE TRIGGER IF NOT EXISTS applicant_search_update AFTER UPDATE OF {_columns} ON applicants BEGIN "
+    f"INSERT INTO applicant_search(applicant_search, rowid, {_columns}) VALUES ('delete', old.rowid, {_old}); "
+    f"INSERT INTO applicant_search(rowid, {_columns}) VALUES (new.rowid, {_new}); END",
+)
+
+# Create the index and its triggers, they come and go with the applicants table
+def create_index(conn) -> None:
+    for statement in CREATE_STATEMENTS:
+        conn.exec_driver_sql(statement)
+
+# Bulk loads skip the per-row insert trigger and rebuild the index in one pass afterwards, which is several times faster
+def drop_insert_trigger(conn) -> None:
+    conn.exec_driver_sql("DROP TRIGGER IF EXISTS applicant_search_insert")
+
+# Re-read every applicant into the index
+def rebuild(conn) -> None:
+    conn.exec_driver_sql("INSERT INTO applicant_search(applicant_search) VALUES ('rebuild')")
+
+for statement in CREATE_STATEMENTS:
+    event.listen(models.Applicant.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(models.Applicant.__table__, "before_drop", DDL("DROP TABLE IF EXISTS applicant_search").execute_if(dialect="sqlite"))
+
+# Turn free text into an FTS5 query matching every word, quoted so punctuation can't break the syntax
+def match_expression(q: str) -> str:
+    terms = re.findall(r"\w+", q)
+    if not terms:
+        raise ValueError("The search needs at least one word")
+    return " ".join(f'"{term}"' for term in terms)
+
+# Ordering by the rank column lets FTS5 sort inside the index, so snippets are only built for the rows returned
+SEARCH_QUERY = text(f"""
+    SELECT applicants.netid, applicants.name, applicants.major, applicants.teams,
+           applicant_search.rank AS rank,
+           snippet(applicant_search, -1, '[', ']', '...', {SNIPPET_TOKENS}) AS snippet
+    FROM applicant_search JOIN applicants ON applicants.rowid = applicant_search.rowid
+    WHERE applicant_search MATCH :match AND applicant_search.rank MATCH 'bm25({', '.join(map(str, SEARCH_WEIGHTS))})'
+    ORDER BY applicant_search.rank
+    LIMIT :limit
+""")
+
+# Best matches first, bm25 ranks are negative and lower is better
+def search(conn, q: str, limit: int = DEFAULT_LIMIT) -> List[dict]:
+    rows = conn.execute(SEARCH_QUERY, {"match": match_expression(q), "limit": limit})
+    return [dict(row._mapping) for row in rows]
@@ -0,0 +1,351 @@
+#*********************************************************************************#
+# This file contains the read-only snapshot: applicants joined with their         #
+# assignments in a compact columnar file that reports read through mmap, without  #
+# opening SQLite or building ORM objects                                          #
+#*********************************************************************************#
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+from array import array
+from collections import namedtuple
+from datetime import date
+from itertools import accumulate
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Same setting as database.py, read here so checking the snapshot never imports SQLAlchemy
+DATABASE_URL = os.environ.get('TRACKER_DATABASE_URL', 'sqlite:///./applicant.db')
+
+# TRACKER_SNAPSHOT_PATH overrides where the snapshot lives, by default next to the DB
+SNAPSHOT_PATH = os.environ.get('TRACKER_SNAPSHOT_PATH')
+
+MAGIC = b"TRKSNAP1"
+FORMAT_VERSION = 1
+
+# Sections are aligned so the numeric arrays can be cast in place
+ALIGNMENT = 8
+
+# Stored in place of NULL in the numeric columns
+NULL_INT = -(1 << 63)
+NULL_BOOL = -1
+NULL_DATE = 0
+
+# (name, type) of every column, in the order SNAPSHOT_QUERY returns them
+# str: offsets + UTF-8 blob, category: codes into a list of values kept in the header,
+# int: int64, bool: int8, date: int32 ordinal
+COLUMNS = (
+    ("netid", "str"), ("name", "str"), ("email", "str"), ("selected", "bool"), ("comments", "category"),
+    ("year", "category"), ("major", "category"), ("smajor", "category"), ("teams", "category"),
+    ("minor", "category"), ("sminor", "category"), ("task_id", "int"), ("version", "int"),
+    ("assignment_no", "category"), ("team_assigned", "category"), ("date_given", "date"), ("date_due", "date"),
+    ("submitted", "bool"), ("assignment_comments", "category"), ("task_version", "int"),
+)
+TYPECODES = {"int": "q", "bool": "b", "date": "i", "category": "i"}
+
+# Every applicant with their assignment, if any, in netid order: the netid column is the netid -> row index
+SNAPSHOT_QUERY = (
+    "SELECT applicants.netid, applicants.name, applicants.email, applicants.selected, applicants.comments, "
+    "applicants.year, applicants.major, applicants.smajor, applicants.teams, applicants.minor, applicants.sminor, "
+    "applicants.task_id, applicants.version, assignments.assignment_no, assignments.team_assigned, "
+    "assignments.date_given, assignments.date_due, assignments.submitted, assignments.assignment_comments, "
+    "assignments.version FROM applicants LEFT JOIN assignments ON assignments.id = applicants.task_id "
+    "ORDER BY applicants.netid"
+)
+
+# Fields of the applicant records, the same shape as cache.serialize_applicant
+APPLICANT_FIELDS = ("netid", "selected", "comments", "name", "email", "year", "major", "smajor", "teams", "minor", "sminor", "task_id", "version")
+TASK_FIELDS = ("assignment_no", "team_assigned", "date_given", "date_due", "submitted", "assignment_comments")
+
+# Columns of a team roster
+ROSTER_FIELDS = ("netid", "name", "email", "year", "major", "assignment_no", "date_due", "submitted", "selected")
+
+# Same sections and row shape as overview.overview_query, so the overview writers take either
+NOT_SUBMITTED, SUBMITTED, OVERDUE = 0, 1, 2
+SECTION_NAMES = {NOT_SUBMITTED: "not_submitted", SUBMITTED: "submitted", OVERDUE: "overdue"}
+OverviewRow = namedtuple("OverviewRow", (
+    "section", "netid", "name", "assignment_no", "date_given", "date_due", "assignment_comments", "count_0", "count_1", "count_2",
+))
+
+class SnapshotError(Exception):
+    pass
+
+# Path of the SQLite file behind a sqlite:/// URL
+def database_path(url: str = DATABASE_URL) -> str:
+    prefix = "sqlite:///"
+    if not url.startswith(prefix) or url[len(prefix):] in ("", ":memory:"):
+        raise SnapshotError(f"Snapshots need an SQLite file, not {url}")
+    return url[len(prefix):]
+
+def snapshot_path(db_path: Optional[str] = None) -> str:
+    return SNAPSHOT_PATH or (db_path or database_path()) + ".snapshot"
+
+# Size and modification time of the DB and its WAL, any commit changes one of them.
+# Only stats the files, so telling whether a snapshot is stale is cheap. An empty WAL counts as
+# no WAL, connections create one when they open the DB and delete it when the last one closes
+def fingerprint(db_path: str) -> List[int]:
+    values = []
+    for path in (db_path, db_path + "-wal"):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stat = None
+        values += [stat.st_size, stat.st_mtime_ns] if stat and stat.st_size else [0, 0]
+    return values
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def _ordinal(value, cache: Dict) -> int:
+    if value is None:
+        return NULL_DATE
+    ordinal = cache.get(value)
+    if ordinal is None:
+        ordinal = cache[value] = date.fromisoformat(value).toordinal()
+    return ordinal
+
+# Encode one column as its sections, plus what the header needs to read it back
+def _encode(kind: str, values: list) -> Tuple[List[bytes], dict]:
+    if kind == "str":
+        blobs = [("" if value is None else value).encode() for value in values]
+        offsets = array("I", [0])
+        offsets.extend(accumulate(map(len, blobs)))
+        return [offsets.tobytes(), b"".join(blobs)], {}
+    if kind == "category":
+        codes = {}
+        encoded = array("i", [codes.setdefault(value, len(codes)) for value in values])
+        return [encoded.tobytes()], {"values": list(codes)}
+    if kind == "date":
+        cache = {}
+        return [array("i", [_ordinal(value, cache) for value in values]).tobytes()], {}
+    if kind == "bool":
+        return [array("b", [NULL_BOOL if value is None else int(value) for value in values]).tobytes()], {}
+    return [array("q", [NULL_INT if value is None else value for value in values]).tobytes()], {}
+
+# Read the DB into a snapshot file, written next to it and moved into place so readers never see half a file.
+# The fingerprint is taken before and after reading, a write in between (or the WAL being checkpointed
+# when this connection closes) means the read is retried
+def build(db_path: Optional[str] = None, path: Optional[str] = None, attempts: int = 3) -> str:
+    db_path = db_path or database_path()
+    path = path or snapshot_path(db_path)
+    if not os.path.exists(db_path):
+        raise SnapshotError(f"There is no database at {db_path}, run init first")
+    for _ in range(attempts):
+        before = fingerprint(db_path)
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute(SNAPSHOT_QUERY).fetchall()
+        finally:
+            conn.close()
+        after = fingerprint(db_path)
+        if before == after:
+            break
+    columns = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+
+    sections = []
+    header = {"format": FORMAT_VERSION, "fingerprint": after, "rows": len(rows), "columns": {}}
+    offset = 0
+    def add(data: bytes) -> List[int]:
+        nonlocal offset
+        sections.append((offset, data))
+        start, offset = offset, _align(offset + len(data))
+        return [start, len(data)]
+    for (name, kind), values in zip(COLUMNS, columns):
+        data, extra = _encode(kind, values)
+        header["columns"][name] = {"type": kind, "sections": [add(section) for section in data], **extra}
+
+    # Rows that have an assignment, by assignment id: the order of the overview sections
+    task_ids = columns[11]
+    has_task = [version is not None for version in columns[19]]
+    by_task = sorted((i for i in range(len(rows)) if has_task[i]), key=task_ids.__getitem__)
+    header["by_task"] = add(array("I", by_task).tobytes())
+
+    # Applicants per team, status and due date, as in the summary table
+    summary = {}
+    for team, submitted, date_due, present in zip(columns[14], columns[17], columns[16], has_task):
+        if present and date_due is not None:
+            key = (team or "", int(submitted or 0), date_due)
+            summary[key] = summary.get(key, 0) + 1
+    header["summary"] = [[*key, count] for key, count in sorted(summary.items())]
+
+    encoded_header = json.dumps(header).encode()
+    data_start = _align(len(MAGIC) + 8 + len(encoded_header))
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(MAGIC)
+        file.write(struct.pack("<Q", len(encoded_header)))
+        file.write(encoded_header)
+        for section_offset, data in sections:
+            file.seek(data_start + section_offset)
+            file.write(data)
+        file.truncate(data_start + offset)
+    os.replace(temporary, path)
+    return path
+
+# A snapshot file mapped into memory, values are only decoded for the rows a query touches
+class Snapshot:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise SnapshotError(f"{path} is not a snapshot")
+        (header_length,) = struct.unpack_from("<Q", self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        self.header = json.loads(self._mmap[header_start:header_start + header_length])
+        if self.header["format"] != FORMAT_VERSION:
+            raise SnapshotError(f"{path} was written in another format, rebuild it")
+        self.rows = self.header["rows"]
+        self.fingerprint = self.header["fingerprint"]
+        data = memoryview(self._mmap)[_align(header_start + header_length):]
+        def section(start_length, typecode="B"):
+            start, length = start_length
+            return data[start:start + length].cast(typecode)
+        self._strings = {}
+        self._arrays = {}
+        self._categories = {}
+        for name, column in self.header["columns"].items():
+            kind = column["type"]
+            if kind == "str":
+                offsets, blob = column["sections"]
+                self._strings[name] = (section(offsets, "I"), section(blob))
+            else:
+                self._arrays[name] = section(column["sections"][0], TYPECODES[kind])
+                if kind == "category":
+                    self._categories[name] = column["values"]
+        self._by_task = section(self.header["by_task"], "I")
+        self._dates = {}
+
+    def is_fresh(self, db_path: str) -> bool:
+        return fingerprint(db_path) == self.fingerprint
+
+    def _string(self, name: str, row: int) -> str:
+        offsets, blob = self._strings[name]
+        return str(blob[offsets[row]:offsets[row + 1]], "utf-8")
+
+    def _date(self, ordinal: int) -> Optional[date]:
+        if ordinal == NULL_DATE:
+            return None
+        value = self._dates.get(ordinal)
+        if value is None:
+            value = self._dates[ordinal] = date.fromordinal(ordinal)
+        return value
+
+    def value(self, name: str, row: int):
+        if name in self._strings:
+            return self._string(name, row)
+        raw = self._arrays[name][row]
+        kind = self.header["columns"][name]["type"]
+        if kind == "category":
+            return self._categories[name][raw]
+        if kind == "date":
+            return self._date(raw)
+        if kind == "bool":
+            return None if raw == NULL_BOOL else bool(raw)
+        return None if raw == NULL_INT else raw
+
+    # Binary search of the sorted netid column, the bytes are compared without decoding them
+    def find(self, netid: str) -> Optional[int]:
+        key = netid.encode()
+        offsets, blob = self._strings["netid"]
+        low, high = 0, self.rows
+        while low < high:
+            middle = (low + high) // 2
+            if blob[offsets[middle]:offsets[middle + 1]].tobytes() < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.rows and blob[offsets[low]:offsets[low + 1]].tobytes() == key:
+            return low
+        return None
+
+    # The applicant as a dict shaped like schemas.ShowApplicant, None if there is no such netid
+    def applicant(self, netid: str) -> Optional[dict]:
+        row = self.find(netid)
+        if row is None:
+            return None
+        record = {field: self.value(field, row) for field in APPLICANT_FIELDS}
+        task_version = self.value("task_version", row)
+        if task_version is None:
+            record["task"] = None
+        else:
+            record["task"] = {"id": record["task_id"], **{field: self.value(field, row) for field in TASK_FIELDS}, "version": task_version}
+        return record
+
+    # Overview rows in the order and shape of overview.stream_overview
+    def overview_rows(self, today: Optional[date] = None) -> Iterator[OverviewRow]:
+        today = (today or date.today()).toordinal()
+        submitted = self._arrays["submitted"]
+        date_due = self._arrays["date_due"]
+        in_section = {
+            NOT_SUBMITTED: lambda row: submitted[row] == 0,
+            SUBMITTED: lambda row: submitted[row] == 1,
+            OVERDUE: lambda row: NULL_DATE != date_due[row] < today,
+        }
+        members = {section: [row for row in self._by_task if test(row)] for section, test in in_section.items()}
+        counts = [len(members[section]) for section in (NOT_SUBMITTED, SUBMITTED, OVERDUE)]
+        value = self.value
+        for section, rows in members.items():
+            for row in rows:
+                yield OverviewRow(
+                    section, self._string("netid", row), self._string("name", row), value("assignment_no", row),
+                    value("date_given", row), value("date_due", row), value("assignment_comments", row), *counts,
+                )
+
+    # Same result as summary.overview_summary, from the counts stored in the header
+    def overview_summary(self, today: Optional[date] = None) -> dict:
+        today = today or date.today()
+        names = list(SECTION_NAMES.values())
+        totals = dict.fromkeys(names, 0)
+        teams = {}
+        next_due = None
+        for team, submitted, date_due, count in self.header["summary"]:
+            date_due = date.fromisoformat(date_due)
+            team_counts = teams.setdefault(team, dict.fromkeys(names, 0))
+            sections = [SECTION_NAMES[SUBMITTED if submitted else NOT_SUBMITTED]]
+            if date_due < today:
+                sections.append(SECTION_NAMES[OVERDUE])
+            elif not submitted and (next_due is None or date_due < next_due):
+                next_due = date_due
+            for section in sections:
+                team_counts[section] += count
+                totals[section] += count
+        return {
+            "today": today,
+            "given": totals[SECTION_NAMES[NOT_SUBMITTED]] + totals[SECTION_NAMES[SUBMITTED]],
+            "totals": totals,
+            "teams": teams,
+            "next_due": next_due,
+        }
+
+    # Applicants assigned to a team, in netid order
+    def roster(self, team: str) -> List[dict]:
+        values = self._categories["team_assigned"]
+        if team not in values:
+            return []
+        code = values.index(team)
+        rows = [row for row, value in enumerate(self._arrays["team_assigned"]) if value == code]
+        return [{field: self.value(field, row) for field in ROSTER_FIELDS} for row in rows]
+
+_current: Optional[Snapshot] = None
+_lock = threading.Lock()
+
+# The snapshot of the DB, rebuilt first if the DB changed since it was written
+def current(db_path: Optional[str] = None) -> Snapshot:
+    global _current
+    db_path = db_path or database_path()
+    path = snapshot_path(db_path)
+    with _lock:
+        if _current is not None and _current.path == path and _current.is_fresh(db_path):
+            return _current
+        try:
+            snapshot = Snapshot(path) if os.path.exists(path) else None
+        except SnapshotError:
+            snapshot = None # Written by another version, replaced below
+        if snapshot is None or not snapshot.is_fresh(db_path):
+            build(db_path, path)
+            snapshot = Snapshot(path)
+        # The old mapping stays valid for readers still holding it, the file was replaced rather than rewritten
+        _current = snapshot
+        return snapshot
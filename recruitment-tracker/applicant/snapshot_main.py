@@ -0,0 +1,47 @@
+#*********************************************************************************#
+# Read-only API answered from the snapshot, for reports and lookups that should   #
+# not touch the DB while it is being written. Writes go through applicant.main    #
+# Usage: uvicorn applicant.snapshot_main:app                                      #
+#*********************************************************************************#
+import os
+import tempfile
+from typing import List
+
+from fastapi import FastAPI, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+
+from . import overview, schemas, snapshot
+
+app = FastAPI()
+
+# Media types of the exported overview formats
+MEDIA_TYPES = {"txt": "text/plain", "csv": "text/csv", "jsonl": "application/x-ndjson", "md": "text/markdown"}
+
+# Every request reads the current snapshot, which is rebuilt first if the DB changed
+@app.get('/applicant/{netid}', response_model=schemas.ShowApplicant, tags=['applicants'])
+def get_by_netid(netid: str):
+    applicant = snapshot.current().applicant(netid)
+    if not applicant:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Applicant with netid '{netid}' not found")
+    return applicant
+
+@app.get('/overview', response_model=schemas.OverviewSummary, tags=['overview'])
+def overview_summary():
+    return snapshot.current().overview_summary()
+
+# The whole overview as a file, written to a temporary file that is removed once it was sent
+@app.get('/overview/export', tags=['overview'])
+def overview_export(format: str = Query("csv", enum=list(overview.FORMATS))):
+    descriptor, path = tempfile.mkstemp(suffix="." + format)
+    os.close(descriptor)
+    try:
+        overview.write_overview(snapshot.current().overview_rows(), path, format)
+    except ValueError as e:
+        os.remove(path)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return FileResponse(path, media_type=MEDIA_TYPES[format], filename="overview." + format, background=BackgroundTask(os.remove, path))
+
+@app.get('/roster/{team}', response_model=List[schemas.RosterEntry], tags=['assignments'])
+def roster(team: str):
+    return snapshot.current().roster(team)
@@ -0,0 +1,114 @@
+#*********************************************************************************#
+# This file contains the overview summary: applicant counts per team, status and  #
+# due date, kept in step with the applicants and assignments tables by triggers    #
+#*********************************************************************************#
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import DDL, event, func, select
+
+from . import models
+from .overview import NOT_SUBMITTED, SECTION_NAMES, SUBMITTED, OVERDUE
+
+# Upsert adding applicants to the summary row of a team, status and due date
+_ADD = (
+    "INSERT INTO overview_summary(team_assigned, submitted, date_due, applicants) {select} "
+    "ON CONFLICT(team_assigned, submitted, date_due) DO UPDATE SET applicants = applicants + excluded.applicants;"
+)
+# Empty rows are dropped so the table only ever holds the combinations in use
+_DROP_EMPTY = "DELETE FROM overview_summary WHERE applicants <= 0;"
+
+# Moving an applicant in or out counts them against their assignment
+_ADD_APPLICANT = _ADD.format(select=(
+    "SELECT coalesce(team_assigned, ''), coalesce(submitted, 0), date_due, 1 FROM assignments "
+    "WHERE id = new.task_id AND date_due IS NOT NULL"
+))
+_REMOVE_APPLICANT = (
+    "UPDATE overview_summary SET applicants = applicants - 1 WHERE (team_assigned, submitted, date_due) IN ("
+    "SELECT coalesce(team_assigned, ''), coalesce(submitted, 0), date_due FROM assignments WHERE id = old.task_id);"
+)
+
+# Changing an assignment moves every applicant doing it
+_ADD_ASSIGNMENT = _ADD.format(select=(
+    "SELECT coalesce(new.team_assigned, ''), coalesce(new.submitted, 0), new.date_due, count(*) FROM applicants "
+    "WHERE applicants.task_id = new.id AND new.date_due IS NOT NULL HAVING count(*) > 0"
+))
+_REMOVE_ASSIGNMENT = (
+    "UPDATE overview_summary SET applicants = applicants - (SELECT count(*) FROM applicants WHERE task_id = old.id) "
+    "WHERE team_assigned = coalesce(old.team_assigned, '') AND submitted = coalesce(old.submitted, 0) AND date_due = old.date_due;"
+)
+
+# name -> (table, event, body)
+TRIGGERS = {
+    "overview_summary_applicant_insert": ("applicants", "AFTER INSERT", _ADD_APPLICANT),
+    "overview_summary_applicant_delete": ("applicants", "AFTER DELETE", _REMOVE_APPLICANT + _DROP_EMPTY),
+    "overview_summary_applicant_update": ("applicants", "AFTER UPDATE OF task_id", _REMOVE_APPLICANT + _DROP_EMPTY + _ADD_APPLICANT),
+    "overview_summary_assignment_insert": ("assignments", "AFTER INSERT", _ADD_ASSIGNMENT),
+    "overview_summary_assignment_delete": ("assignments", "AFTER DELETE", _REMOVE_ASSIGNMENT + _DROP_EMPTY),
+    "overview_summary_assignment_update": (
+        "assignments", "AFTER UPDATE OF id, team_assigned, submitted, date_due", _REMOVE_ASSIGNMENT + _DROP_EMPTY + _ADD_ASSIGNMENT,
+    ),
+}
+
+# Triggers skipped by bulk loads, which rebuild the summary in one GROUP BY afterwards
+INSERT_TRIGGERS = ("overview_summary_applicant_insert", "overview_summary_assignment_insert")
+
+def _create_statement(name: str) -> str:
+    table, when, body = TRIGGERS[name]
+    return f"CREATE TRIGGER IF NOT EXISTS {name} {when} ON {table} BEGIN {body} END"
+
+def create_triggers(conn) -> None:
+    for name in TRIGGERS:
+        conn.exec_driver_sql(_create_statement(name))
+
+def drop_insert_triggers(conn) -> None:
+    for name in INSERT_TRIGGERS:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+
+# Recount the summary from the applicants and assignments tables
+def rebuild(conn) -> None:
+    conn.exec_driver_sql("DELETE FROM overview_summary")
+    conn.exec_driver_sql(
+        "INSERT INTO overview_summary(team_assigned, submitted, date_due, applicants) "
+        "SELECT coalesce(assignments.team_assigned, ''), coalesce(assignments.submitted, 0), assignments.date_due, count(*) "
+        "FROM assignments JOIN applicants ON applicants.task_id = assignments.id "
+        "WHERE assignments.date_due IS NOT NULL "
+        "GROUP BY 1, 2, 3"
+    )
+
+# The triggers come and go with the table they are on
+_TABLES = {"applicants": models.Applicant.__table__, "assignments": models.AdditionalInfo.__table__}
+for name, (table, _, _) in TRIGGERS.items():
+    event.listen(_TABLES[table], "after_create", DDL(_create_statement(name)).execute_if(dialect="sqlite"))
+
+# Per-section counts overall and per team, plus the next due date of a not-submitted assignment.
+# Reads a few rows per team and due date, however many applicants there are
+def overview_summary(conn, today: Optional[date] = None) -> dict:
+    today = today or date.today()
+    table = models.OverviewSummary.__table__
+    totals = {SECTION_NAMES[section]: 0 for section in (NOT_SUBMITTED, SUBMITTED, OVERDUE)}
+    teams = {}
+    rows = conn.execute(
+        select(table.c.team_assigned, table.c.submitted, func.sum(table.c.applicants)).group_by(table.c.team_assigned, table.c.submitted)
+    )
+    for team, submitted, count in rows:
+        section = SECTION_NAMES[SUBMITTED if submitted else NOT_SUBMITTED]
+        teams.setdefault(team, dict.fromkeys(totals, 0))[section] += count
+        totals[section] += count
+    overdue = conn.execute(
+        select(table.c.team_assigned, func.sum(table.c.applicants)).where(table.c.date_due < today).group_by(table.c.team_assigned)
+    )
+    for team, count in overdue:
+        teams.setdefault(team, dict.fromkeys(totals, 0))[SECTION_NAMES[OVERDUE]] += count
+        totals[SECTION_NAMES[OVERDUE]] += count
+    next_due = conn.execute(
+        select(func.min(table.c.date_due)).where(table.c.submitted == False, table.c.date_due >= today)
+    ).scalar()
+    return {
+        "today": today,
+        # Every assignment is either submitted or not, so those two sections cover all applicants
+        "given": totals[SECTION_NAMES[NOT_SUBMITTED]] + totals[SECTION_NAMES[SUBMITTED]],
+        "totals": totals,
+        "teams": teams,
+        "next_due": next_due,
+    }
@@ -0,0 +1,80 @@
+#*********************************************************************************#
+# Benchmark: row-by-row vs columnar assignment CSV reader on a large file with    #
+# some malformed rows, also checks both readers agree on records and errors       #
+# Usage: python benchmarks/bench_assignment_reader.py [--rows 1000000]            #
+# The columnar reader needs pyarrow (pip install pyarrow) to be any faster        #
+#*********************************************************************************#
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date, timedelta
+from itertools import zip_longest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import ASSIGNMENT_HEADER, TEAMS
+
+# Every `every`-th row is changed this way, the extra columns are kept by both readers and the rest are errors
+MALFORMED = (
+    (997, lambda row: row[:2] + ["", "", "", ""] + row[6:]), # no team
+    (1499, lambda row: row[:7] + ["2022-02-30"]), # impossible due date
+    (2003, lambda row: row[:6] + ["15/12/2021"] + row[7:]), # not ISO
+    (3001, lambda row: row[:5]), # short row
+    (1201, lambda row: row + ["", ""]), # trailing empty columns, as spreadsheet exports add
+)
+
+def write_assignments(path, rows: int, seed: int = 0):
+    rng = random.Random(seed)
+    given = date(2021, 12, 15)
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(ASSIGNMENT_HEADER)
+        for i in range(rows):
+            teams = [""] * len(TEAMS)
+            teams[rng.randrange(len(TEAMS))] = f"Assignment {rng.randrange(1, 40)}"
+            row = [f"Person {i}", f"person{i}@example.com", *teams, given.isoformat(), (given + timedelta(days=rng.randrange(7, 60))).isoformat()]
+            for every, broken in MALFORMED:
+                if i % every == every - 1:
+                    row = broken(row)
+            writer.writerow(row)
+
+def timed(reader, path):
+    errors = []
+    start = time.perf_counter()
+    records = sum(1 for _ in reader(path, errors))
+    return time.perf_counter() - start, records, errors
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    from applicant import columnar
+    from applicant.ingest import read_csv_assignment, string_to_date
+
+    if columnar.pa is None:
+        print("pyarrow is not installed, the columnar reader falls back to the row reader")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "assignment.csv")
+        write_assignments(path, args.rows)
+        results = {}
+        for label, reader in (("row reader", read_csv_assignment), ("columnar reader", columnar.read_csv_assignment_columnar)):
+            string_to_date.cache_clear()
+            seconds, records, errors = timed(reader, path)
+            results[label] = sorted((error.row, error.reason) for error in errors)
+            print(f"{label:<16} {seconds:6.2f}s  {args.rows / seconds:9.0f} rows/s  records={records} errors={len(errors)}")
+        mismatches = sum(
+            1 for a, b in zip_longest(read_csv_assignment(path, []), columnar.read_csv_assignment_columnar(path, [])) if a != b
+        )
+        same_errors = results["row reader"] == results["columnar reader"]
+        reasons = Counter(reason.split(" '")[0] for _, reason in results["row reader"])
+        print("records differing:", mismatches, "| errors by reason:", dict(reasons), "| same errors:", same_errors)
+        sys.exit(0 if mismatches == 0 and same_errors else 1)
+
+if __name__ == "__main__":
+    main()
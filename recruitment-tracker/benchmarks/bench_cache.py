@@ -0,0 +1,57 @@
+#*********************************************************************************#
+# Benchmark: repeated netid lookups with the applicant cache on and off           #
+# Usage: python benchmarks/bench_cache.py [--rows 5000] [--lookups 20000]         #
+#                                         [--hot 300]                             #
+#*********************************************************************************#
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import write_csv_pair
+
+def timed(lookup, netids):
+    start = time.perf_counter()
+    for netid in netids:
+        lookup(netid)
+    return time.perf_counter() - start
+
+def report(label, seconds, lookups):
+    print(f"{label:<28} {seconds:.2f}s  {seconds / lookups * 1e6:8.1f} us/lookup")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--hot", type=int, default=300, help="distinct netids looked up, like an interview day")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["TRACKER_DATABASE_URL"] = "sqlite:///" + os.path.join(directory, "cache.db")
+        from fastapi.testclient import TestClient
+        from applicant import cache, ingest
+        from applicant.database import SessionLocal
+        from applicant.main import app
+
+        ingest.ingest_files(*write_csv_pair(directory, args.rows))
+        rng = random.Random(0)
+        hot = [f"person{rng.randrange(args.rows)}" for _ in range(args.hot)]
+        netids = [rng.choice(hot) for _ in range(args.lookups)]
+        client = TestClient(app)
+        db = SessionLocal()
+        print(f"rows={args.rows} lookups={args.lookups} distinct netids={len(set(netids))}")
+        for label, maxsize in (("cache off", 0), ("cache on", cache.CACHE_SIZE)):
+            cache.applicant_cache.maxsize = maxsize
+            cache.applicant_cache.clear()
+            report(f"{label}: get_applicant", timed(lambda netid: cache.get_applicant(db, netid), netids), args.lookups)
+            cache.applicant_cache.clear()
+            report(f"{label}: GET /applicant", timed(lambda netid: client.get(f"/applicant/{netid}"), netids), args.lookups)
+        print("cache stats:", cache.applicant_cache.stats())
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+#*********************************************************************************#
+# Benchmark: rows per second of `overview --output` for every export format       #
+# Usage: python benchmarks/bench_overview_export.py [--rows 100000]               #
+#*********************************************************************************#
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import write_csv_pair
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Point the app at a scratch DB before anything imports applicant.database
+        os.environ["TRACKER_DATABASE_URL"] = "sqlite:///" + os.path.join(directory, "bench.db")
+        from applicant import ingest, overview
+        from applicant.database import SessionLocal, engine
+
+        ingest.ingest_files(*write_csv_pair(directory, args.rows))
+        with engine.begin() as conn:
+            conn.exec_driver_sql("UPDATE assignments SET submitted = 1 WHERE id % 3 = 0")
+
+        db = SessionLocal()
+        print(f"{'format':<8}{'rows':>10}{'seconds':>10}{'rows/s':>12}")
+        for output_format in overview.FORMATS:
+            path = os.path.join(directory, "overview." + output_format)
+            start = time.perf_counter()
+            rows = overview.export_overview(db, path, output_format)
+            seconds = time.perf_counter() - start
+            print(f"{output_format:<8}{rows:>10}{seconds:>10.3f}{rows / seconds:>12.0f}")
+        db.close()
+
+if __name__ == "__main__":
+    main()
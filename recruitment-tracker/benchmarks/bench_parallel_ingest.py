@@ -0,0 +1,37 @@
+#*********************************************************************************#
+# Benchmark: init on several CSV pairs with 1, 2, 4 and 8 parsing processes       #
+# Usage: python benchmarks/bench_parallel_ingest.py [--pairs 8] [--rows 20000]    #
+#                                                   [--workers 1 2 4 8]           #
+#*********************************************************************************#
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import write_csv_pair
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pairs", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=20000, help="rows per pair")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["TRACKER_DATABASE_URL"] = "sqlite:///" + os.path.join(directory, "parallel.db")
+        from applicant import ingest
+
+        for pair in range(args.pairs):
+            write_csv_pair(directory, args.rows, seed=pair, prefix=f"cycle{pair}_", start=pair * args.rows)
+        pairs = ingest.find_pairs([directory])
+        print(f"pairs={len(pairs)} rows={args.pairs * args.rows} cpus={os.cpu_count()}")
+        baseline = None
+        for workers in args.workers:
+            stats = ingest.ingest_pairs(pairs, workers=workers)
+            baseline = baseline or stats.seconds
+            print(f"workers={workers:<3} {stats.seconds:6.2f}s  {stats.rows_per_second:9.0f} rows/s  speedup x{baseline / stats.seconds:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#*********************************************************************************#
+# Benchmark: CLI startup cost of `cli.py --help`                                  #
+# Usage: python benchmarks/bench_startup.py [--runs 10] [--target-ms 100]         #
+# Times `cli.py --help` against a bare interpreter and reads `python -X importtime`#
+# to check FastAPI, pydantic and SQLAlchemy are not imported; exits 1 if either   #
+# check fails                                                                     #
+#*********************************************************************************#
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI = os.path.join(ROOT, "cli.py")
+
+# Modules that only the commands themselves should pull in
+HEAVY_MODULES = ("fastapi", "pydantic", "sqlalchemy", "applicant")
+
+def wall_ms(args, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+# {module: cumulative import time in ms} from python -X importtime
+def import_times(args) -> dict:
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", *args], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True,
+    ).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1000
+    return times
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--target-ms", type=float, default=100)
+    args = parser.parse_args()
+
+    interpreter = wall_ms(["-c", "pass"], args.runs)
+    cli = wall_ms([CLI, "--help"], args.runs)
+    overhead = cli - interpreter
+    times = import_times([CLI, "--help"])
+    heavy = sorted(name for name in times if name.split(".")[0] in HEAVY_MODULES)
+
+    print(f"bare interpreter:   {interpreter:7.1f} ms")
+    print(f"cli.py --help:      {cli:7.1f} ms")
+    print(f"startup overhead:   {overhead:7.1f} ms (target {args.target_ms:.0f} ms)")
+    print("slowest imports:")
+    for name, ms in sorted(times.items(), key=lambda item: -item[1])[:5]:
+        print(f"  {name:<30}{ms:7.1f} ms")
+    if heavy:
+        print("heavy modules imported by --help:", ", ".join(heavy))
+    sys.exit(1 if heavy or overhead > args.target_ms else 0)
+
+if __name__ == "__main__":
+    main()
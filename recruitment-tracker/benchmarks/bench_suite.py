@@ -0,0 +1,172 @@
+#*********************************************************************************#
+# Benchmark suite: times init, overview, search and the main API routes on        #
+# synthetic data and compares every case against the stored baselines             #
+# Usage: python benchmarks/bench_suite.py [--size 1k] [--size 100k] [--rounds 5]  #
+#        [--threshold 0.5] [--data-dir DIR] [--save-baseline]                     #
+# Exits 1 if a case got slower than its baseline by more than the threshold       #
+#*********************************************************************************#
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import SIZES, UNASSIGNED_RATIO, write_csv_pair
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# A case only counts as a regression if it is also this many seconds per call slower, so noise on the fastest cases never fails the suite
+MIN_REGRESSION = 0.002
+
+SEARCH_QUERIES = ["python", "machine learning", "quant research", "risk", "monte carlo", "kaggle", "trading strategy", "hedge fund"]
+
+# Generated CSVs are kept in `data_dir` and reused, the 1m pair takes a few minutes to write
+def csv_pair(data_dir: str, size: str):
+    paths = (os.path.join(data_dir, f"{size}_assignment.csv"), os.path.join(data_dir, f"{size}_submission.csv"))
+    if not all(os.path.exists(path) for path in paths):
+        print(f"Generating the {size} CSV pair in {data_dir}")
+        paths = write_csv_pair(data_dir, SIZES[size], prefix=f"{size}_", unassigned=UNASSIGNED_RATIO)
+    return paths
+
+# (name, calls per round, function) for every case, in the order they run. init has to come first
+def suite_cases(paths, directory, rows: int):
+    from fastapi.testclient import TestClient
+    from applicant import helpers
+    from applicant.main import app
+
+    client = TestClient(app)
+    rng = random.Random(0)
+    netids = [f"person{rng.randrange(rows)}" for _ in range(100)]
+    task_ids = [rng.randrange(1, rows + 1) for _ in range(100)]
+
+    def init():
+        helpers.ingest_pairs([paths])
+
+    def overview_export():
+        helpers.write_overview_to_applicants(os.path.join(directory, "overview.csv"), "csv")
+
+    def get(url):
+        response = client.get(url)
+        assert response.status_code < 300, (url, response.status_code)
+        return response
+
+    def calls(fn, args):
+        return len(args), lambda: [fn(arg) for arg in args]
+
+    def applicant_pages():
+        after = ""
+        for _ in range(20):
+            after = get(f"/applicant?limit=100&after={after}").json()["next_after"]
+
+    def create_and_delete():
+        for i in range(25):
+            task_id = task_ids[i]
+            client.post("/applicant", json={
+                "name": "Bench", "netid": f"bench{i}", "email": "bench@example.com", "year": "Junior",
+                "major": "Mathematics", "teams": "Business", "task_id": task_id,
+            }).raise_for_status()
+            client.delete(f"/applicant/bench{i}").raise_for_status()
+
+    return [
+        ("init", 1, init),
+        ("overview --output csv", 1, overview_export),
+        ("overview --summary", 20, lambda: [helpers.overview_summary() for _ in range(20)]),
+        ("search --text", *calls(helpers.search_text, SEARCH_QUERIES)),
+        ("search NETID", *calls(helpers.get_by_netid, netids[:20])),
+        ("GET /applicant/{netid}", *calls(get, [f"/applicant/{netid}" for netid in netids])),
+        ("GET /applicant?limit=100", 20, applicant_pages),
+        ("GET /assignment/{id}", *calls(get, [f"/assignment/{task_id}" for task_id in task_ids])),
+        ("GET /assignments/{no}", *calls(get, ["/assignments/Assignment 7", "/assignments/Assignment 23"])),
+        ("GET /search", *calls(get, [f"/search?q={q}" for q in SEARCH_QUERIES])),
+        ("GET /overview", *calls(get, ["/overview"] * 20)),
+        ("POST+DELETE /applicant", 25, create_and_delete),
+    ]
+
+# Fastest seconds per call of every case over `rounds` rounds, the commands' printed output is discarded
+def run_size(paths, directory, rows: int, rounds: int):
+    results = {}
+    for name, calls, fn in suite_cases(paths, directory, rows):
+        timings = []
+        for _ in range(rounds):
+            with redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                fn()
+                timings.append((time.perf_counter() - start) / calls)
+        results[name] = min(timings)
+        print(f"  {name:<28}{results[name] * 1000:>12.2f} ms")
+    return results
+
+def load_baselines() -> dict:
+    if not os.path.exists(BASELINES):
+        return {"machine": None, "sizes": {}}
+    with open(BASELINES) as file:
+        return json.load(file)
+
+# Print every case next to its baseline, returns the cases that regressed
+def compare(size: str, results: dict, baseline: dict, threshold: float):
+    regressions = []
+    print(f"{'case':<30}{'ms':>10}{'baseline':>10}{'change':>9}")
+    for name, seconds in results.items():
+        if name not in baseline:
+            print(f"{name:<30}{seconds * 1000:>10.2f}{'-':>10}{'':>9}  new")
+            continue
+        change = seconds / baseline[name] - 1
+        regressed = change > threshold and seconds - baseline[name] > MIN_REGRESSION
+        if regressed:
+            regressions.append((size, name))
+        print(f"{name:<30}{seconds * 1000:>10.2f}{baseline[name] * 1000:>10.2f}{change:>+9.0%}  {'REGRESSION' if regressed else 'ok'}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", action="append", choices=SIZES, help="1k, 100k or 1m, can be repeated [default: 1k]")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.5, help="allowed slowdown against the baseline, 0.5 is 50%%")
+    parser.add_argument("--data-dir", help="keep the generated CSVs here between runs")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline of its sizes")
+    args = parser.parse_args()
+    sizes = args.size or ["1k"]
+
+    with tempfile.TemporaryDirectory() as directory:
+        data_dir = args.data_dir or directory
+        os.makedirs(data_dir, exist_ok=True)
+        # Point the app at a scratch DB before anything imports applicant.database, with the netid
+        # cache off so lookups are timed against the database
+        os.environ["TRACKER_DATABASE_URL"] = "sqlite:///" + os.path.join(directory, "suite.db")
+        os.environ["TRACKER_CACHE_SIZE"] = "0"
+
+        baselines = load_baselines()
+        machine = f"{platform.machine()} {platform.processor() or platform.system()}, {os.cpu_count()} CPU, Python {platform.python_version()}"
+        if baselines["machine"] and baselines["machine"] != machine and not args.save_baseline:
+            print(f"Baselines were recorded on {baselines['machine']}, this is {machine}: expect differences")
+        regressions = []
+        for size in sizes:
+            paths = csv_pair(data_dir, size)
+            print(f"{size} ({SIZES[size]} assigned applicants), best of {args.rounds} rounds, per call:")
+            results = run_size(paths, directory, SIZES[size], args.rounds)
+            if args.save_baseline:
+                baselines["sizes"][size] = {name: round(seconds, 6) for name, seconds in results.items()}
+            elif size in baselines["sizes"]:
+                regressions += compare(size, results, baselines["sizes"][size], args.threshold)
+            else:
+                print(f"No baseline for {size}, store one with --save-baseline")
+
+        if args.save_baseline:
+            baselines["machine"] = machine
+            with open(BASELINES, "w") as file:
+                json.dump(baselines, file, indent=2, sort_keys=True)
+                file.write("\n")
+            print("Saved the baselines of", ", ".join(sizes), "to", BASELINES)
+        if regressions:
+            print("Regressed:", ", ".join(f"{name} ({size})" for size, name in regressions))
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
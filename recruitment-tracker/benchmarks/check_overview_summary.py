@@ -0,0 +1,110 @@
+#*********************************************************************************#
+# Check: the overview summary table matches a full recount after random writes    #
+# through the API, and time it against the full overview query                    #
+# Usage: python benchmarks/check_overview_summary.py [--rows 5000] [--writes 500] #
+#*********************************************************************************#
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import TEAMS, YEARS, write_csv_pair
+
+# Counts recomputed from the applicants and assignments tables
+def recount(conn, today):
+    rows = conn.exec_driver_sql(
+        "SELECT team_assigned, submitted, date_due < ?, count(*) FROM assignments "
+        "JOIN applicants ON applicants.task_id = assignments.id GROUP BY 1, 2, 3",
+        (today.isoformat(),),
+    )
+    teams = {}
+    for team, submitted, overdue, count in rows:
+        counts = teams.setdefault(team, {"not_submitted": 0, "submitted": 0, "overdue": 0})
+        counts["submitted" if submitted else "not_submitted"] += count
+        if overdue:
+            counts["overdue"] += count
+    return teams
+
+def random_write(client, rng, state):
+    roll = rng.random()
+    netid = f"person{rng.randrange(state['rows'])}"
+    if roll < 0.25:
+        state["next_id"] += 1
+        client.post("/assignment", json={
+            "id": state["next_id"], "assignment_no": "Check", "team_assigned": rng.choice(TEAMS),
+            "date_given": "2021-12-15", "date_due": (date.today() + timedelta(days=rng.randrange(-30, 30))).isoformat(),
+        })
+    elif roll < 0.5:
+        client.put(f"/assignment/{rng.randrange(1, state['next_id'] + 1)}", json={
+            "assignment_no": "Check", "team_assigned": rng.choice(TEAMS), "date_given": "2021-12-15",
+            "date_due": (date.today() + timedelta(days=rng.randrange(-30, 30))).isoformat(), "submitted": rng.random() < 0.5,
+        })
+    elif roll < 0.65:
+        client.delete(f"/applicant/{netid}")
+    elif roll < 0.85:
+        applicant = client.get(f"/applicant/{netid}")
+        if applicant.status_code < 400:
+            body = applicant.json()
+            body.pop("task")
+            body["netid"] = f"moved{state['moved']}"
+            body["task_id"] = rng.randrange(1, state["next_id"] + 1)
+            state["moved"] += 1
+            client.put(f"/applicant/{netid}", json=body)
+    elif roll < 0.9:
+        ids = rng.sample(range(1, state["next_id"] + 1), 5)
+        client.patch("/assignments:batch", json={"items": [
+            {"id": id, "version": 1, "team_assigned": rng.choice(TEAMS), "submitted": rng.random() < 0.5} for id in ids
+        ]})
+        client.post("/applicants:delete", json={"netids": [f"person{rng.randrange(state['rows'])}" for _ in range(3)]})
+    else:
+        state["created"] += 1
+        client.post("/applicant", json={
+            "name": "Check", "netid": f"created{state['created']}", "email": "check@example.com", "year": rng.choice(YEARS),
+            "major": "Mathematics", "teams": rng.choice(TEAMS), "task_id": rng.randrange(1, state["next_id"] + 1),
+        })
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--writes", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["TRACKER_DATABASE_URL"] = "sqlite:///" + os.path.join(directory, "summary.db")
+        from fastapi.testclient import TestClient
+        from applicant import ingest, overview, summary
+        from applicant.async_main import app
+        from applicant.database import SessionLocal, engine
+
+        ingest.ingest_files(*write_csv_pair(directory, args.rows))
+        client = TestClient(app)
+        rng = random.Random(0)
+        state = {"rows": args.rows, "next_id": args.rows, "moved": 0, "created": 0}
+        for _ in range(args.writes):
+            random_write(client, rng, state)
+        today = date.today()
+        db = SessionLocal()
+
+        start = time.perf_counter()
+        counts = summary.overview_summary(db, today)
+        summary_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        full = overview.overview_counts(next(overview.stream_overview(db, today), None))
+        full_seconds = time.perf_counter() - start
+        with engine.connect() as conn:
+            expected = recount(conn, today)
+        db.close()
+
+        ok = counts["teams"] == expected and [counts["totals"][overview.SECTION_NAMES[s]] for s in overview.SECTIONS] == [full[s] for s in overview.SECTIONS]
+        print(f"rows={args.rows} writes={args.writes} summary={summary_seconds * 1000:.1f} ms full overview query={full_seconds * 1000:.1f} ms")
+        print("totals:", counts["totals"], "next due:", counts["next_due"])
+        print("ok" if ok else f"FAIL expected {expected}")
+        sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
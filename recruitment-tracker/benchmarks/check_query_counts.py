@@ -0,0 +1,54 @@
+#*********************************************************************************#
+# Check: the endpoints returning nested models run a fixed number of SQL          #
+# statements however many rows they return                                        #
+# Usage: python benchmarks/check_query_counts.py (exits 1 if a count is off)      #
+#*********************************************************************************#
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import write_csv_pair
+
+NEW_APPLICANT = {
+    "name": "Query Count", "netid": "querycount", "email": "querycount@example.com", "year": "Junior",
+    "major": "Computer Science", "teams": "Business", "task_id": 1,
+}
+
+# (method, path, body, statements expected)
+REQUESTS = [
+    ("GET", "/applicant/person1", None, 2), # The ingest generation the cache checks, then the applicant
+    ("GET", "/applicant?limit=1000", None, 1),
+    ("GET", "/assignment/1", None, 2),
+    ("GET", "/assignments/{assignment_no}", None, 2),
+    ("POST", "/applicant", NEW_APPLICANT, 4),
+    ("DELETE", "/applicant/querycount", None, 2),
+]
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["TRACKER_DATABASE_URL"] = "sqlite:///" + os.path.join(directory, "counts.db")
+        from fastapi.testclient import TestClient
+        from applicant import ingest
+        from applicant.database import engine
+        from applicant.instrumentation import QueryCounter
+        from applicant.main import app
+
+        failed = False
+        client = TestClient(app)
+        for rows in (50, 5000):
+            ingest.ingest_files(*write_csv_pair(directory, rows))
+            with engine.connect() as conn:
+                assignment_no = conn.exec_driver_sql("SELECT assignment_no FROM assignments WHERE id = 1").scalar()
+            for method, path, body, expected in REQUESTS:
+                path = path.format(assignment_no=assignment_no)
+                with QueryCounter(engine) as counter:
+                    response = client.request(method, path, json=body)
+                ok = counter.count == expected and response.status_code < 400
+                failed = failed or not ok
+                print(f"{'ok  ' if ok else 'FAIL'} rows={rows:<6} {method:<7} {path:<28} status={response.status_code} statements={counter.count} expected={expected}")
+        sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#*********************************************************************************#
+# Check: EXPLAIN QUERY PLAN of the hot filters uses the indexes from models.py    #
+# Usage: python benchmarks/check_query_plans.py (exits 1 if a query misses one)   #
+#*********************************************************************************#
+import os
+import sys
+import tempfile
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, select
+
+from synthetic import write_csv_pair
+
+# Run a statement with EXPLAIN QUERY PLAN prepended, so binds are processed exactly as in the app
+def explain(engine, conn, statement):
+    def prefix(conn, cursor, sql, parameters, context, executemany):
+        return "EXPLAIN QUERY PLAN " + sql, parameters
+    event.listen(engine, "before_cursor_execute", prefix, retval=True)
+    try:
+        return [row[-1] for row in conn.execute(statement)]
+    finally:
+        event.remove(engine, "before_cursor_execute", prefix)
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["TRACKER_DATABASE_URL"] = "sqlite:///" + os.path.join(directory, "plans.db")
+        from applicant import ingest, models, overview, search
+        from applicant.database import engine
+
+        ingest.ingest_files(*write_csv_pair(directory, 2000))
+        assignment = models.AdditionalInfo
+        applicant = models.Applicant
+        today = date.today()
+        # (description, statement, index the plan must mention)
+        checks = [
+            ("assignments by number", select(assignment).where(assignment.assignment_no == "Assignment 1"), "ix_assignments_assignment_no"),
+            ("applicants by task id", select(applicant).where(applicant.task_id == 1), "ix_applicants_task_id"),
+            ("not submitted", select(assignment).where(assignment.submitted == False), "ix_assignments_submitted_date_due"),
+            ("submitted and due", select(assignment).where(assignment.submitted == True, assignment.date_due < today), "ix_assignments_submitted_date_due"),
+            ("overdue", select(assignment).where(assignment.date_due < today), "ix_assignments_date_due"),
+            ("overview join", overview.overview_query(today), "ix_applicants_task_id"),
+            ("full-text search", search.SEARCH_QUERY.bindparams(match='"python"', limit=20), "applicant_search VIRTUAL TABLE"),
+        ]
+        failed = False
+        with engine.connect() as conn:
+            for description, statement, index in checks:
+                plan = explain(engine, conn, statement)
+                ok = any(index in step for step in plan)
+                failed = failed or not ok
+                print(f"{'ok  ' if ok else 'FAIL'} {description:<22} {' / '.join(plan)}")
+        sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#*********************************************************************************#
+# Check: reports read from the snapshot match the database after random writes   #
+# through the API, the snapshot is only rebuilt when the database changed, and    #
+# time both ways of answering                                                     #
+# Usage: python benchmarks/check_snapshot.py [--rows 5000] [--writes 500]         #
+#*********************************************************************************#
+import argparse
+import filecmp
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from check_overview_summary import random_write
+from synthetic import TEAMS, UNASSIGNED_RATIO, write_csv_pair
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--writes", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "snapshot.db")
+        os.environ["TRACKER_DATABASE_URL"] = "sqlite:///" + db_path
+        from fastapi.testclient import TestClient
+        from applicant import cache, helpers, ingest, overview, queries, snapshot, summary
+        from applicant.database import SessionLocal
+        from applicant.main import app
+
+        ingest.ingest_files(*write_csv_pair(directory, args.rows, unassigned=UNASSIGNED_RATIO))
+        client = TestClient(app)
+        rng = random.Random(0)
+        state = {"rows": args.rows, "next_id": args.rows, "moved": 0, "created": 0}
+        for _ in range(args.writes):
+            random_write(client, rng, state)
+        client.post("/assignments:submit", json={"ids": rng.sample(range(1, args.rows + 1), args.rows // 3)})
+
+        failures = []
+        def check(description, ok):
+            print(f"{'ok  ' if ok else 'FAIL'} {description}")
+            if not ok:
+                failures.append(description)
+
+        _, build_seconds = timed(helpers.build_snapshot)
+        snap = snapshot.current()
+        check("snapshot is fresh after it was built", snap.is_fresh(db_path))
+        db = SessionLocal()
+        db.execute(queries.roster_query(TEAMS[0])).all()
+        db.close()
+        check("reading the database leaves it fresh", snap.is_fresh(db_path))
+
+        timings = {}
+        for output_format in overview.FORMATS:
+            from_db = os.path.join(directory, "db." + output_format)
+            from_snapshot = os.path.join(directory, "snapshot." + output_format)
+            _, timings[f"overview --output {output_format} (db)"] = timed(lambda: helpers.write_overview_to_applicants(from_db, output_format))
+            _, timings[f"overview --output {output_format} (snapshot)"] = timed(
+                lambda: helpers.write_overview_to_applicants(from_snapshot, output_format, from_snapshot=True)
+            )
+            check(f"overview export as {output_format} is identical", filecmp.cmp(from_db, from_snapshot, shallow=False))
+
+        db = SessionLocal()
+        expected, timings["overview --summary (db)"] = timed(lambda: summary.overview_summary(db))
+        actual, timings["overview --summary (snapshot)"] = timed(snap.overview_summary)
+        check("overview summary is identical", expected == actual)
+
+        same = True
+        for team in TEAMS:
+            expected, seconds = timed(lambda: [tuple(row) for row in db.execute(queries.roster_query(team))])
+            timings["roster (db)"] = timings.get("roster (db)", 0) + seconds
+            actual, seconds = timed(lambda: [tuple(row.values()) for row in snap.roster(team)])
+            timings["roster (snapshot)"] = timings.get("roster (snapshot)", 0) + seconds
+            same = same and expected == actual
+        check("rosters of every team are identical", same)
+
+        netids = [f"person{rng.randrange(args.rows)}" for _ in range(1000)] + ["created1", "moved1", "nobody"]
+        expected, timings["1000 netid lookups (db)"] = timed(lambda: [cache.load_applicant(db, netid) for netid in netids])
+        actual, timings["1000 netid lookups (snapshot)"] = timed(lambda: [snap.applicant(netid) for netid in netids])
+        check("netid lookups are identical", expected == actual)
+        db.close()
+
+        client.patch(f"/applicant/{netids[0]}", json={"version": expected[0]["version"], "comments": "changed"})
+        check("a write makes the snapshot stale", not snap.is_fresh(db_path))
+        rebuilt = snapshot.current()
+        check("the stale snapshot is rebuilt with the write", rebuilt.applicant(netids[0])["comments"] == "changed")
+
+        print(f"rows={args.rows} writes={args.writes} build={build_seconds * 1000:.0f} ms size={os.path.getsize(snap.path) / 1e6:.1f} MB "
+              f"(database {os.path.getsize(db_path) / 1e6:.1f} MB)")
+        for name, seconds in timings.items():
+            print(f"  {name:<36}{seconds * 1000:>10.1f} ms")
+        sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
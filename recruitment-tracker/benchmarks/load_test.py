@@ -0,0 +1,110 @@
+#*********************************************************************************#
+# Load test: throughput and latency of the API under concurrent clients           #
+# Usage: python benchmarks/load_test.py [--app applicant.async_main:app]          #
+#                                       [--clients 50] [--requests 40]            #
+# Needs httpx (pip install httpx), the server is started with uvicorn on a        #
+# scratch DB seeded with synthetic applicants                                     #
+#*********************************************************************************#
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import write_csv_pair
+
+try:
+    import httpx
+except ImportError:
+    sys.exit("The load test needs httpx: pip install httpx")
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def wait_until_up(client, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.get("/docs")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not start")
+
+# One client: mostly reads, with a share of writes creating new assignments
+async def run_client(client, rng, rows, requests, write_ratio, next_id, latencies, statuses):
+    for _ in range(requests):
+        roll = rng.random()
+        start = time.perf_counter()
+        try:
+            if roll < write_ratio:
+                task_id = next(next_id)
+                response = await client.post("/assignment", json={
+                    "id": task_id, "assignment_no": "Load Test", "team_assigned": "Business",
+                    "date_given": "2021-12-15", "date_due": "2021-12-30",
+                })
+            elif roll < write_ratio + 0.1:
+                response = await client.get(f"/assignments/Assignment {rng.randrange(1, 40)}")
+            else:
+                response = await client.get(f"/applicant/person{rng.randrange(rows)}")
+            statuses[response.status_code] += 1
+        except httpx.TransportError as e:
+            statuses[type(e).__name__] += 1
+        latencies.append(time.perf_counter() - start)
+
+async def load(url, clients, requests, rows, write_ratio):
+    latencies = []
+    statuses = Counter()
+    ids = iter(range(10_000_000, 20_000_000))
+    limits = httpx.Limits(max_connections=clients)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        await wait_until_up(client)
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            run_client(client, random.Random(seed), rows, requests, write_ratio, ids, latencies, statuses)
+            for seed in range(clients)
+        ])
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+    print(f"clients={clients} requests={len(latencies)} seconds={elapsed:.2f} throughput={len(latencies) / elapsed:.0f} req/s")
+    print(f"latency ms: p50={percentile(0.5):.1f} p95={percentile(0.95):.1f} p99={percentile(0.99):.1f}")
+    print("status codes:", dict(sorted(statuses.items(), key=str)))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app", default="applicant.async_main:app")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=40, help="requests per client")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, TRACKER_DATABASE_URL="sqlite:///" + os.path.join(directory, "load.db"))
+        seed = "import sys; from applicant import ingest; ingest.ingest_files(sys.argv[1], sys.argv[2])"
+        subprocess.run([sys.executable, "-c", seed, *write_csv_pair(directory, args.rows)], cwd=ROOT, env=env, check=True)
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", args.app, "--port", str(port), "--log-level", "warning"],
+            cwd=ROOT, env=env,
+        )
+        try:
+            print("app:", args.app)
+            asyncio.run(load(f"http://127.0.0.1:{port}", args.clients, args.requests, args.rows, args.write_ratio))
+        finally:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    main()
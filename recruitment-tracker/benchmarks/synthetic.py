@@ -0,0 +1,143 @@
+#*********************************************************************************#
+# This file generates matching assignment/submission CSVs for the benchmarks      #
+# Usage: python benchmarks/synthetic.py OUTPUT_DIR [--size 1k|100k|1m] [--seed 0] #
+# The distributions below were measured on example_assignment.csv and             #
+# example_submission.csv                                                          #
+#*********************************************************************************#
+import argparse
+import csv
+import os
+import random
+import time
+from datetime import date, timedelta
+from itertools import accumulate
+
+ASSIGNMENT_HEADER = ["Name", "Email", "Quantitative Research", "Strategy Implementation", "Software Development", "Business", "Date Given", "Due Date"]
+SUBMISSION_HEADER = [
+    "", "Timestamp", "Email Address", "Name", "NetID", "Year in School", "Major",
+    "Second Major (if applicable)", "Minor (if applicable)", "Second Minor (if applicable)", "GPA",
+    "LinkedIn/Personal Website", "Which team interests you?", "Why does this team interest you?",
+    "How much time can you commit per week?", "What value will you bring to Quant?", "What do you hope to get out of Quant?",
+]
+TEAMS = ["Quantitative Research", "Strategy Implementation", "Software Development", "Business"]
+YEARS = ["Freshman", "Sophomore", "Junior", "Senior", "Master's", "PhD"]
+MAJORS = ["Computer Science", "Mathematics", "Statistics", "Economics", "Finance", "Physics"]
+
+# Named sizes of the benchmark suite
+SIZES = {"1k": 1000, "100k": 100000, "1m": 1000000}
+
+# Submissions without an assignment per assigned applicant (75 submissions for 40 assignments in the examples)
+UNASSIGNED_RATIO = 0.875
+
+# (value, weight) pairs, weights are counts in the example CSVs
+TEAM_WEIGHTS = [10, 19, 3, 8] # team assigned, in TEAMS order
+YEAR_WEIGHTS = [18, 19, 8, 2, 4, 1]
+INTERESTS = [
+    ("Software Development", 12), ("Quantitative Research", 9), ("Software Development, Quantitative Research", 8),
+    ("Software Development, Strategy Implementation, Quantitative Research", 5), ("Strategy Implementation, Quantitative Research", 5),
+    ("Software Development, Strategy Implementation", 4), ("Strategy Implementation", 3), ("External Affairs", 2),
+    ("Strategy Implementation, Quantitative Research, External Affairs", 2), ("Software Development, External Affairs", 1),
+]
+COMMITMENTS = [("10 hours", 3), ("10-15 hours", 3), ("5-10 hours", 2), ("8-10 hrs", 2), ("5", 2), ("15-20 hours", 1)]
+FIRST_NAMES = (
+    "Jessica Teresa Angela Andre Michael Priya Wei Daniel Sofia Omar Hannah Lucas Aisha Ethan Mei Carlos "
+    "Olivia Rahul Grace Noah Fatima Liam Chloe Arjun Emma Diego Yuki Samuel Leah Kevin"
+).split()
+LAST_NAMES = (
+    "Smith Aguilar Miranda Mccormick Chen Patel Kim Nguyen Garcia Johnson Williams Brown Lee Singh Lopez "
+    "Martin Wang Davis Hernandez Clark Lewis Walker Young Allen Wright Scott Green Baker Adams Turner"
+).split()
+
+# Essay length in words is log-normal, median and spread fitted to the three essay columns of the examples
+ESSAY_LENGTHS = {"why": (45, 0.75), "value": (42, 0.6), "hopes": (31, 0.6)}
+MAX_ESSAY_WORDS = 300
+
+# Essay vocabulary, most frequent first, with Zipf frequencies so full-text search sees common and rare words
+VOCABULARY = (
+    "the and to i in of a my am interested team that with have this would be as for learn quant experience "
+    "research software development trading financial markets data strategy python skills also working "
+    "quantitative finance learning work apply knowledge interest implementation models believe projects "
+    "c++ machine mathematics statistics programming opportunity develop algorithms market understanding "
+    "background hope passionate technical field computer science gain network industry career real world "
+    "analysis problem solving collaborate exposure java risk modeling probability optimization backtesting "
+    "portfolio options derivatives signals alpha pricing volatility execution latency infrastructure "
+    "pipeline database cloud linux statistical regression bayesian inference econometrics stochastic "
+    "calculus linear algebra deep neural networks competitions kaggle hackathon internship club professors "
+    "mentorship leadership communication presentation excel valuation equity fixed income crypto "
+    "blockchain arbitrage hedge fund high frequency simulation monte carlo time series forecasting"
+).split()
+# Each word repeated in proportion to its frequency, picking uniformly from this is much faster than weighted choices
+WORD_TABLE = [word for rank, word in enumerate(VOCABULARY, 1) for _ in range(round(1000 / rank))]
+
+def _essay(rng, kind: str) -> str:
+    median, sigma = ESSAY_LENGTHS[kind]
+    words = min(MAX_ESSAY_WORDS, max(1, round(rng.lognormvariate(0, sigma) * median)))
+    return " ".join(rng.choices(WORD_TABLE, k=words)) + "."
+
+def _weighted(pairs):
+    values = [value for value, _ in pairs]
+    return values, list(accumulate(weight for _, weight in pairs))
+
+# Write an assignment/submission CSV pair with `rows` assigned applicants, returns both paths
+# Several pairs in one directory need their own `prefix`, and a `start` that keeps their netids apart
+# `unassigned` adds that many submissions per assigned applicant that no assignment matches
+def write_csv_pair(directory, rows: int, seed: int = 0, prefix: str = "", start: int = 0, unassigned: float = 0.0):
+    rng = random.Random(seed)
+    assignment_path = os.path.join(directory, f"{prefix}assignment.csv")
+    submission_path = os.path.join(directory, f"{prefix}submission.csv")
+    teams_weights = list(accumulate(TEAM_WEIGHTS))
+    years_weights = list(accumulate(YEAR_WEIGHTS))
+    interests, interests_weights = _weighted(INTERESTS)
+    commitments, commitments_weights = _weighted(COMMITMENTS)
+    given = date(2021, 12, 15)
+    index = 0
+    with open(assignment_path, "w", newline="") as assignments, open(submission_path, "w", newline="") as submissions:
+        assignment_writer = csv.writer(assignments)
+        submission_writer = csv.writer(submissions)
+        assignment_writer.writerow(ASSIGNMENT_HEADER)
+        submission_writer.writerow(SUBMISSION_HEADER)
+
+        def submit(netid, name, email, team):
+            nonlocal index
+            submission_writer.writerow([
+                index, "12/2/2021 17:41:15", email, name, netid,
+                rng.choices(YEARS, cum_weights=years_weights)[0], rng.choice(MAJORS),
+                rng.choice(MAJORS) if rng.random() < 0.1 else "", rng.choice(MAJORS) if rng.random() < 0.4 else "",
+                rng.choice(MAJORS) if rng.random() < 0.1 else "", f"{rng.uniform(3.0, 4.0):.2f}",
+                f"https://www.linkedin.com/in/{netid}",
+                team if rng.random() < 0.5 else rng.choices(interests, cum_weights=interests_weights)[0],
+                _essay(rng, "why"), rng.choices(commitments, cum_weights=commitments_weights)[0],
+                _essay(rng, "value"), _essay(rng, "hopes"),
+            ])
+            index += 1
+
+        for i in range(start, start + rows):
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            email = f"person{i}@example.com"
+            team = rng.choices(range(len(TEAMS)), cum_weights=teams_weights)[0]
+            teams = [""] * len(TEAMS)
+            teams[team] = f"Assignment {rng.randrange(1, 40)}"
+            date_due = given + timedelta(days=rng.randrange(7, 60))
+            assignment_writer.writerow([name, email, *teams, given.isoformat(), date_due.isoformat()])
+            submit(f"person{i}", name, email, TEAMS[team])
+            # A fractional ratio adds an extra submission to that share of the rows
+            extra = int(unassigned) + (rng.random() < unassigned % 1)
+            for j in range(extra):
+                submit(f"applicant{i}x{j}", f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", f"applicant{i}x{j}@example.com", TEAMS[team])
+    return assignment_path, submission_path
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output")
+    parser.add_argument("--size", choices=SIZES, default="1k")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--unassigned", type=float, default=UNASSIGNED_RATIO, help="submissions without an assignment per assigned applicant")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    start = time.perf_counter()
+    paths = write_csv_pair(args.output, SIZES[args.size], seed=args.seed, prefix=f"{args.size}_", unassigned=args.unassigned)
+    print(f"Wrote {' and '.join(paths)} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
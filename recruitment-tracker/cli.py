@@ -1,38 +1,110 @@
-# Import all the relevant functions from helper.py
-#from applicant.helpers import read_csv_assignment, read_csv_submission, write_to_db, overview_applicants, write_overview_to_applicants, get_by_netid
-from applicant.helpers import *
+# Only typer is imported up front, the helpers (SQLAlchemy, the models and the DB connection)
+# are imported inside each command so --help and argument errors start instantly
+from typing import List
+
 import typer
 
 app = typer.Typer()
 
-# Populate database by passing 2 CSV files
+# Options shared by every command, e.g. python3 cli.py --profile overview
+@app.callback()
+def main(ctx: typer.Context, profile: bool = typer.Option(False, help="profile the command with cProfile and time its SQL statements"),
+         profile_output: str = typer.Option("profile", help="the profile is written to <this>.pstats and <this>.json")):
+    if profile:
+        from applicant.instrumentation import profile_command
+        ctx.call_on_close(profile_command(profile_output))
+
+# Populate database by passing CSV files, directories or globs holding assignment/submission pairs
 @app.command()
-def init(file_assignment: str, file_submission: str):
+def init(paths: List[str] = typer.Argument(..., help="assignment/submission CSV pairs, as files, directories or globs"),
+         batch_size: int = 1000, incremental: bool = False, workers: int = typer.Option(1, help="processes parsing the CSV pairs"),
+         columnar: bool = typer.Option(False, help="parse assignment files a block at a time with pyarrow"),
+         errors: str = typer.Option(None, help="write the malformed rows that were left out to this CSV file"),
+         snapshot: bool = typer.Option(True, help="rebuild the read-only snapshot afterwards")):
     try: 
-        assignments = read_csv_assignment(file_assignment)
-        submissions = read_csv_submission(file_submission)
-        write_to_db(assignments, submissions)
-        print("Succesfully Added Records To The Database")
+        from applicant.helpers import build_snapshot, find_pairs, ingest_pairs, write_error_report
+        pairs = find_pairs(paths)
+        stats = ingest_pairs(pairs, batch_size, incremental, workers, columnar)
+        print("Succesfully Added", stats.rows, "Records From", len(pairs), "Pair(s) Of Files To The Database")
+        if incremental:
+            print("Skipped", stats.unchanged, "Unchanged Records")
+        if stats.duplicates:
+            print("Skipped", stats.duplicates, "Records Whose NetID Was Already Added")
+        if stats.errors:
+            print("Skipped", len(stats.errors), "Malformed Rows")
+            if errors:
+                write_error_report(stats.errors, errors)
+                print("Wrote The Malformed Rows To", errors)
+            else:
+                for error in stats.errors[:5]:
+                    print(" ", error.file, "row", error.row, "-", error.reason)
+        if stats.files_unchanged:
+            print("Files Unchanged Since The Last Init")
+        else:
+            print("Ingested %.0f Rows Per Second" % stats.rows_per_second)
+        if snapshot:
+            print("Snapshot Up To Date At", build_snapshot())
     except Exception as e:
         print("Something Went Wrong Populating The Database. Error: ",e)
 
 # Get an Applicant Overview
 @app.command()
-def overview(output_to_file: bool = False):
+def overview(output_to_file: bool = False, output: str = None, output_format: str = typer.Option("md", "--format", help="csv, jsonl, md or txt"),
+             summary: bool = typer.Option(False, help="only print the counts per team, read from the summary table"),
+             from_snapshot: bool = typer.Option(False, help="read the snapshot instead of the database")):
     try:
-        overview_applicants()
+        from applicant.helpers import overview_applicants, overview_summary, write_overview_to_applicants
+        if summary:
+            overview_summary(from_snapshot)
+            return
+        if output:
+            # Exports are streamed straight to the file instead of being printed
+            rows = write_overview_to_applicants(output, output_format, from_snapshot)
+            print("Wrote", rows, "Rows To", output)
+            return
+        overview_applicants(from_snapshot)
         if output_to_file == True:
-            write_overview_to_applicants()
+            write_overview_to_applicants(from_snapshot=from_snapshot)
     except Exception as e:
         print("Something Went Wrong Generating an Overview. Error: ",e)
 
-# Search By Netid
+# Search By Netid, or through names, majors and essay answers with --text
 @app.command()
-def search(netid: str):
+def search(netid: str = typer.Argument(None), text: str = typer.Option(None, "--text", help="words to look for"), limit: int = 20,
+           from_snapshot: bool = typer.Option(False, help="look the netid up in the snapshot instead of the database")):
     try:
-        get_by_netid(netid)
+        if text:
+            if from_snapshot:
+                print("Full-text search needs the database, the snapshot holds no essays")
+                return
+            from applicant.helpers import search_text
+            search_text(text, limit)
+            return
+        if not netid:
+            print("Pass a NetID or --text to search")
+            return
+        from applicant.helpers import get_by_netid
+        get_by_netid(netid, from_snapshot)
     except Exception as e:
         print("Something Went Wrong Getting the Applicant. Error: ",e)
 
+# List everyone assigned to a team
+@app.command()
+def roster(team: str, from_snapshot: bool = typer.Option(False, help="read the snapshot instead of the database")):
+    try:
+        from applicant.helpers import team_roster
+        team_roster(team, from_snapshot)
+    except Exception as e:
+        print("Something Went Wrong Getting the Roster. Error: ",e)
+
+# Rebuild the read-only snapshot if the database changed since it was written
+@app.command()
+def snapshot(force: bool = typer.Option(False, help="rebuild even if the database hasn't changed")):
+    try:
+        from applicant.helpers import build_snapshot
+        print("Snapshot Up To Date At", build_snapshot(force))
+    except Exception as e:
+        print("Something Went Wrong Building the Snapshot. Error: ",e)
+
 if __name__ == "__main__":
     app()
\ No newline at end of file